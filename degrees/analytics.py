@@ -0,0 +1,214 @@
+"""
+Aggregate statistics over the whole degrees graph.
+
+Usage: python analytics.py [directory] [--sample K | --exact] [--top N]
+
+Separation degrees are found with a multi-source, level-synchronous
+BFS: each person carries a bitset (a Python int) with one bit per
+source, and a whole batch of sources advances one level at a time by
+OR-ing bitsets from people into their movies and from movies into
+their stars. One pass over the graph per level serves every source
+in the batch.
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+from array import array
+
+from cache import load_cached_graph
+
+# Sources advanced together by one bitset BFS
+BATCH_WIDTH = 256
+
+
+def components(graph):
+    """
+    Labels every person with a connected component number.
+    Returns (labels, sizes) where sizes[label] counts its people.
+    """
+    labels = array("i", [-1]) * graph.person_count
+    seen_movies = bytearray(graph.movie_count)
+    sizes = []
+    for start in range(graph.person_count):
+        if labels[start] != -1:
+            continue
+        label = len(sizes)
+        labels[start] = label
+        size = 1
+        frontier = [start]
+        while frontier:
+            next_frontier = []
+            for person in frontier:
+                for movie in graph.movies_of(person):
+                    if seen_movies[movie]:
+                        continue
+                    seen_movies[movie] = 1
+                    for star in graph.stars_of(movie):
+                        if labels[star] == -1:
+                            labels[star] = label
+                            size += 1
+                            next_frontier.append(star)
+            frontier = next_frontier
+        sizes.append(size)
+    return labels, sizes
+
+
+def bitset_bfs(graph, sources):
+    """
+    Runs one level-synchronous BFS from every person in `sources`.
+
+    Returns (histogram, eccentricity) where histogram[d] counts the
+    (source, person) pairs exactly d degrees apart, and eccentricity
+    maps each source to its largest finite distance.
+    """
+    seen = [0] * graph.person_count
+    frontier = {}
+    for bit, source in enumerate(sources):
+        seen[source] |= 1 << bit
+        frontier[source] = frontier.get(source, 0) | 1 << bit
+
+    histogram = []
+    last_level = [0] * len(sources)
+    level = 0
+    while frontier:
+        level += 1
+
+        # People push their new bits into their movies...
+        movie_bits = {}
+        for person, bits in frontier.items():
+            for movie in graph.movies_of(person):
+                movie_bits[movie] = movie_bits.get(movie, 0) | bits
+
+        # ...and movies push them into their stars
+        reached = {}
+        for movie, bits in movie_bits.items():
+            for star in graph.stars_of(movie):
+                reached[star] = reached.get(star, 0) | bits
+
+        frontier = {}
+        count = 0
+        arrived = 0
+        for person, bits in reached.items():
+            new = bits & ~seen[person]
+            if new:
+                seen[person] |= new
+                frontier[person] = new
+                count += new.bit_count()
+                arrived |= new
+        if count:
+            histogram.append(count)
+            while arrived:
+                low = arrived & -arrived
+                last_level[low.bit_length() - 1] = level
+                arrived ^= low
+
+    eccentricity = {source: last_level[bit] for bit, source in enumerate(sources)}
+    return [0] + histogram, eccentricity
+
+
+def separation_stats(graph, sources, width=BATCH_WIDTH):
+    """
+    Runs bitset_bfs over `sources` in batches of `width`, merging the
+    histograms and eccentricities.
+    """
+    histogram = []
+    eccentricity = {}
+    for i in range(0, len(sources), width):
+        part, ecc = bitset_bfs(graph, sources[i:i + width])
+        for degree, count in enumerate(part):
+            if degree == len(histogram):
+                histogram.append(0)
+            histogram[degree] += count
+        eccentricity.update(ecc)
+    return histogram, eccentricity
+
+
+def popular(graph, top):
+    """
+    Returns the `top` people with the most movies.
+    """
+    people = range(graph.person_count)
+    return sorted(people, key=lambda p: -len(graph.movies_of(p)))[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Degrees graph statistics.")
+    parser.add_argument("directory", nargs="?", default="large")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--sample", type=int, default=1000, metavar="K",
+                      help="estimate the histogram from K random sources")
+    mode.add_argument("--exact", action="store_true",
+                      help="use every person as a source")
+    parser.add_argument("--top", type=int, default=10, metavar="N",
+                        help="report eccentricity of the N busiest actors")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--width", type=int, default=BATCH_WIDTH,
+                        help="sources per bitset BFS batch")
+    args = parser.parse_args()
+
+    print("Loading data...", file=sys.stderr)
+    graph = load_cached_graph(args.directory)
+    print("Data loaded.", file=sys.stderr)
+
+    start = time.perf_counter()
+    labels, sizes = components(graph)
+    component_seconds = time.perf_counter() - start
+
+    # Sources: everyone, or a uniform sample of everyone; the busiest
+    # actors' eccentricity is found separately
+    hubs = popular(graph, args.top)
+    if args.exact:
+        sources = list(range(graph.person_count))
+    else:
+        rng = random.Random(args.seed)
+        count = min(args.sample, graph.person_count)
+        sources = rng.sample(range(graph.person_count), count)
+
+    start = time.perf_counter()
+    histogram, eccentricity = separation_stats(graph, sources, args.width)
+    bfs_seconds = time.perf_counter() - start
+    if not args.exact:
+        _, eccentricity = separation_stats(graph, hubs, args.width)
+
+    # Pairs whose components differ are never connected
+    unreachable = sum(graph.person_count - sizes[labels[s]] for s in sources)
+    connected = sum(histogram[1:])
+    ordered = sorted(sizes, reverse=True)
+
+    report = {
+        "people": graph.person_count,
+        "movies": graph.movie_count,
+        "components": {
+            "count": len(sizes),
+            "largest": ordered[:10],
+            "singletons": ordered.count(1),
+            "seconds": component_seconds,
+        },
+        "separation": {
+            "sources": len(sources),
+            "exact": args.exact,
+            "histogram": {str(d): n for d, n in enumerate(histogram) if d},
+            "mean": sum(d * n for d, n in enumerate(histogram)) / connected
+            if connected else None,
+            "unreachable_pairs": unreachable,
+            "seconds": bfs_seconds,
+        },
+        "eccentricity": [
+            {
+                "id": graph.person_ids[p],
+                "name": graph.name(p),
+                "movies": len(graph.movies_of(p)),
+                "eccentricity": eccentricity[p],
+                "component_size": sizes[labels[p]],
+            }
+            for p in hubs
+        ],
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
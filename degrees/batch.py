@@ -0,0 +1,296 @@
+"""
+Batch degrees queries read from a CSV or JSONL stream.
+
+Queries are grouped by source so that a single BFSTree per source
+answers every target asked of it. Answers are written and flushed as
+soon as they are found, in the same format as the input.
+"""
+
+import csv
+import gc
+import io
+import json
+import multiprocessing
+import os
+import sys
+import time
+
+import costars
+from cache import load_cached_graph
+from nameindex import NameIndex
+from search import BFSTree, SearchStats
+
+# Graph, and optional co-star and name indexes, used by pool workers.
+# It is set in the parent before the pool forks, so workers share its
+# pages copy-on-write instead of receiving a pickled copy with every
+# task.
+_shared = None
+
+
+def read_queries(stream, fmt):
+    """
+    Yields (source, target, error) from a stream of CSV rows or JSON
+    lines. A CSV header row of "source,target" is skipped. error is
+    None, or says why a line is not a query; its source and target are
+    then whatever could be read, or "".
+    """
+    if fmt == "jsonl":
+        for number, line in enumerate(stream, 1):
+            if not line.strip():
+                continue
+            try:
+                query = json.loads(line)
+                yield str(query["source"]), str(query["target"]), None
+            except (ValueError, KeyError, TypeError):
+                yield "", "", f"malformed query on line {number}"
+    else:
+        reader = csv.reader(stream)
+        for row in reader:
+            if not row or row == ["source", "target"]:
+                continue
+            if len(row) < 2:
+                yield row[0], "", f"malformed query on line {reader.line_num}"
+            else:
+                yield row[0], row[1], None
+
+
+def resolve(graph, key, names=None):
+    """
+    Returns the person index for an IMDB id or an unambiguous name.
+    With a NameIndex, ambiguous or misspelled names resolve to its
+    best-ranked candidate instead. Raises ValueError otherwise.
+    """
+    if key in graph.person_index:
+        return graph.person_index[key]
+    matches = graph.people_named(key)
+    if len(matches) == 1:
+        return matches[0]
+    if names is not None:
+        person = names.resolve(key)
+        if person is not None:
+            return person
+    if matches:
+        raise ValueError(f"ambiguous name: {key}")
+    raise ValueError(f"person not found: {key}")
+
+
+def group_by_source(queries):
+    """
+    Returns ({source: [(position, target), ...]} in first-seen order,
+    [(source, target, error), ...] for the malformed queries).
+    """
+    groups = {}
+    malformed = []
+    for position, (source, target, error) in enumerate(queries):
+        if error is None:
+            groups.setdefault(source, []).append((position, target))
+        else:
+            malformed.append((source, target, error))
+    return groups, malformed
+
+
+def answer_group(graph, source, targets, neighbors=None, names=None,
+                 profile=False):
+    """
+    Yields (position, source, target, path ids or None, error, seconds,
+    counters) for each target of one source, sharing one BFS tree
+    between them. The time to grow the tree is charged to the query
+    that needed it. With `profile`, counters is the dict of that
+    query's SearchStats; otherwise it is None.
+    """
+    start = time.perf_counter()
+    try:
+        tree = BFSTree(resolve(graph, source, names),
+                       neighbors or graph.neighbors)
+        error = None
+    except ValueError as e:
+        tree, error = None, str(e)
+    setup = time.perf_counter() - start
+
+    for position, target in targets:
+        start = time.perf_counter()
+        path, query_error = None, error
+        stats = SearchStats() if profile else None
+        if tree is not None:
+            try:
+                path = tree.path_to(resolve(graph, target, names), stats)
+                path = graph.path_ids(path)
+            except ValueError as e:
+                query_error = str(e)
+        seconds = time.perf_counter() - start + setup
+        setup = 0
+        counters = stats.as_dict() if stats else None
+        yield position, source, target, path, query_error, seconds, counters
+
+
+def format_answer(fmt, source, target, path, error):
+    """
+    Returns one output record as a line of text.
+    """
+    degrees = None if path is None else len(path)
+    if fmt == "jsonl":
+        record = {"source": source, "target": target, "degrees": degrees,
+                  "path": path}
+        if error is not None:
+            record["error"] = error
+        return json.dumps(record) + "\n"
+
+    # path as "movie_id:person_id" steps separated by spaces
+    steps = "" if path is None else " ".join(f"{m}:{p}" for m, p in path)
+    fields = [source, target, "" if degrees is None else degrees, steps,
+              error or ""]
+    line = io.StringIO()
+    csv.writer(line, lineterminator="\n").writerow(fields)
+    return line.getvalue()
+
+
+def write_profile(file, source, target, path, counters):
+    """
+    Writes one query's search counters as a JSON line.
+    """
+    record = {"source": source, "target": target,
+              "degrees": None if path is None else len(path), **counters}
+    file.write(json.dumps(record) + "\n")
+    file.flush()
+
+
+def latency_summary(latencies):
+    """
+    Returns count, mean and percentile latencies in milliseconds.
+    """
+    if not latencies:
+        return {"count": 0}
+    ordered = sorted(latencies)
+    last = len(ordered) - 1
+    summary = {
+        "count": len(ordered),
+        "mean_ms": 1000 * sum(ordered) / len(ordered),
+    }
+    for name, q in (("p50", 0.5), ("p90", 0.9), ("p99", 0.99), ("max", 1)):
+        summary[f"{name}_ms"] = 1000 * ordered[round(q * last)]
+    return summary
+
+
+def run_batch(graph, stream, out, fmt, index=None, names=None, profile=None):
+    """
+    Answers every query in `stream`, writing results to `out` as they
+    are produced. People are expanded through the co-star `index` and
+    names resolved through the NameIndex `names` when given. With a
+    `profile` file, each query's search counters are written to it as
+    one JSON line. Returns the latency summary.
+    """
+    neighbors = index.neighbors if index else None
+    groups, malformed = group_by_source(read_queries(stream, fmt))
+    if fmt == "csv":
+        out.write("source,target,degrees,path,error\n")
+    for source, target, error in malformed:
+        out.write(format_answer(fmt, source, target, None, error))
+
+    latencies = []
+    for source, targets in groups.items():
+        answers = answer_group(graph, source, targets, neighbors, names,
+                               profile is not None)
+        for _, source, target, path, error, seconds, counters in answers:
+            out.write(format_answer(fmt, source, target, path, error))
+            out.flush()
+            latencies.append(seconds)
+            if counters is not None:
+                write_profile(profile, source, target, path, counters)
+    return latency_summary(latencies)
+
+
+def run_parallel_batch(graph, directory, stream, out, fmt, workers,
+                       index=None, names=None, profile=None, deltas=()):
+    """
+    Like run_batch, but spreads source groups over a pool of `workers`
+    processes. Answers are written as each group finishes, so they are
+    not in input order. The summary also carries the co-star statistics
+    merged over all workers; search counters go to `profile` as in
+    run_batch. `deltas` are the parsed deltas applied to `graph` since
+    it was loaded from `directory`.
+    """
+    global _shared
+    groups, malformed = group_by_source(read_queries(stream, fmt))
+    if fmt == "csv":
+        out.write("source,target,degrees,path,error\n")
+    for source, target, error in malformed:
+        out.write(format_answer(fmt, source, target, None, error))
+
+    # Keep the collector from touching (and so copying) the graph's
+    # pages in every worker
+    _shared = (graph, index, names)
+    gc.freeze()
+
+    # Platforms without fork rebuild the same graph and indexes instead
+    initargs = (
+        directory, tuple(deltas), isinstance(index, costars.CostarIndex),
+        index.maxsize if isinstance(index, costars.CostarCache) else 0,
+        names is not None,
+    )
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context(
+        "fork" if "fork" in methods else "spawn"
+    )
+    latencies = []
+    worker_stats = {}
+    try:
+        with context.Pool(workers, _init_worker, initargs) as pool:
+            tasks = pool.imap_unordered(
+                _answer_task,
+                ((source, targets, profile is not None)
+                 for source, targets in groups.items())
+            )
+            for pid, answers, stats in tasks:
+                for answer in answers:
+                    _, source, target, path, error, seconds, counters = answer
+                    out.write(format_answer(fmt, source, target, path, error))
+                    latencies.append(seconds)
+                    if counters is not None:
+                        write_profile(profile, source, target, path,
+                                      counters)
+                out.flush()
+                if stats is not None:
+                    worker_stats[pid] = stats
+    finally:
+        gc.unfreeze()
+        _shared = None
+
+    summary = latency_summary(latencies)
+    if worker_stats:
+        summary["costars"] = costars.merge_stats(list(worker_stats.values()))
+    return summary
+
+
+def _init_worker(directory, deltas, costar_index, costar_cache, best_match):
+    """
+    Platforms without fork load the graph from the snapshot, apply the
+    parent's deltas and build the same co-star and name indexes.
+    """
+    global _shared
+    if _shared is None:
+        graph = load_cached_graph(directory)
+        for delta in deltas:
+            graph.apply_delta(delta)
+        index = None
+        if costar_index:
+            index = costars.CostarIndex(graph)
+        elif costar_cache:
+            index = costars.CostarCache(graph, costar_cache)
+        names = NameIndex(graph) if best_match else None
+        _shared = (graph, index, names)
+
+
+def _answer_task(task):
+    source, targets, profile = task
+    graph, index, names = _shared
+    neighbors = index.neighbors if index else None
+    answers = list(answer_group(graph, source, targets, neighbors, names,
+                                profile))
+    return os.getpid(), answers, index.stats() if index else None
+
+
+def print_summary(summary, file=sys.stderr):
+    print(f"{summary['count']} queries answered.", file=file)
+    for key, value in summary.items():
+        if key.endswith("_ms"):
+            print(f"  {key[:-3]}: {value:.3f} ms", file=file)
@@ -0,0 +1,122 @@
+"""
+Compare the bidirectional search against the original depth-first
+search on random source/target pairs.
+
+Usage: python benchmark.py [directory] [pairs] [seed]
+"""
+
+import random
+import sys
+import time
+
+import degrees
+from search import bidirectional_search
+from util import Node, StackFrontier, TrackedStackFrontier
+
+
+def stack_search(source, target, neighbors, front=None):
+    """
+    The original StackFrontier search from degrees.shortest_path,
+    kept here as the baseline. Pass a TrackedStackFrontier as `front`
+    to count its adds, removes and high-water mark.
+    """
+    if front is None:
+        front = StackFrontier()
+    front.add(Node(state=source, parent=None, action=None))
+    explore = set()
+    while True:
+        if front.empty():
+            return None
+        node = front.remove()
+        if node.state == target:
+            path = []
+            while node.parent is not None:
+                path.append((node.action, node.state))
+                node = node.parent
+            path.reverse()
+            return path
+        explore.add(node.state)
+        for action, state in neighbors(node.state):
+            if not front.contains_state(state) and state not in explore:
+                front.add(Node(state=state, parent=node, action=action))
+
+
+def measure(engine, source, target, front=None):
+    """
+    Run one search, returning (path, explored node count, seconds).
+    A frontier given as `front` is passed on to the engine.
+    """
+    explored = 0
+
+    def neighbors(person_id):
+        nonlocal explored
+        explored += 1
+        return degrees.neighbors_for_person(person_id)
+
+    start = time.perf_counter()
+    if front is None:
+        path = engine(source, target, neighbors)
+    else:
+        path = engine(source, target, neighbors, front)
+    return path, explored, time.perf_counter() - start
+
+
+def main():
+    if len(sys.argv) > 4:
+        sys.exit("Usage: python benchmark.py [directory] [pairs] [seed]")
+    directory = sys.argv[1] if len(sys.argv) > 1 else "large"
+    pairs = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    seed = int(sys.argv[3]) if len(sys.argv) > 3 else 0
+
+    print("Loading data...")
+    degrees.load_data(directory)
+    print("Data loaded.")
+
+    rng = random.Random(seed)
+    # only people who starred in something can be connected
+    ids = sorted(p for p in degrees.people if degrees.people[p]["movies"])
+    # Each engine and the frontier class it is given, if it takes one
+    engines = [
+        ("stack", stack_search, TrackedStackFrontier),
+        ("bidirectional", bidirectional_search, None),
+    ]
+    totals = {name: [0, 0.0] for name, _, _ in engines}
+    # Frontier counts summed over every pair, and the highest mark seen
+    frontier_totals = {"added": 0, "removed": 0, "high_water": 0}
+
+    print(f"{'source':>10} {'target':>10} {'engine':>14} "
+          f"{'length':>7} {'explored':>9} {'seconds':>9} "
+          f"{'added':>9} {'removed':>9} {'high water':>10}")
+    for _ in range(pairs):
+        source, target = rng.choice(ids), rng.choice(ids)
+        for name, engine, frontier in engines:
+            front = None if frontier is None else frontier()
+            path, explored, seconds = measure(engine, source, target, front)
+            totals[name][0] += explored
+            totals[name][1] += seconds
+            length = "-" if path is None else len(path)
+            if front is None:
+                counts = ("-", "-", "-")
+            else:
+                stats = front.stats()
+                frontier_totals["added"] += stats["added"]
+                frontier_totals["removed"] += stats["removed"]
+                frontier_totals["high_water"] = max(
+                    frontier_totals["high_water"], stats["high_water"]
+                )
+                counts = (stats["added"], stats["removed"],
+                          stats["high_water"])
+            print(f"{source:>10} {target:>10} {name:>14} "
+                  f"{length:>7} {explored:>9} {seconds:>9.4f} "
+                  f"{counts[0]:>9} {counts[1]:>9} {counts[2]:>10}")
+
+    print("Totals:")
+    for name, (explored, seconds) in totals.items():
+        print(f"  {name}: {explored} nodes explored in {seconds:.3f}s")
+    print(f"  stack frontier: {frontier_totals['added']} added, "
+          f"{frontier_totals['removed']} removed, "
+          f"high water {frontier_totals['high_water']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+On-disk snapshot of the compact Graph.
+
+The snapshot is written next to the CSV files after the first parse and
+reused for as long as the CSV modification times and sizes match.
+It holds a small pickled header followed by the pickled Graph, whose
+array.array tables serialize as raw bytes.
+
+Landmark distance tables are kept in a second snapshot the same way,
+so the BFS from each landmark runs once per set of CSV files.
+"""
+
+import os
+import pickle
+import tempfile
+
+from graph import load_graph
+from landmarks import LandmarkOracle
+
+CACHE_NAME = ".degrees.cache"
+CACHE_VERSION = 3
+LANDMARKS_NAME = ".degrees.landmarks"
+SOURCES = ("people.csv", "movies.csv", "stars.csv")
+
+
+def load_cached_graph(directory, rebuild=False):
+    """
+    Return the Graph for `directory`, reading the snapshot when it is
+    still fresh and re-parsing the CSV files (and rewriting the
+    snapshot) otherwise, or when `rebuild` is true.
+    """
+    path = cache_path(directory)
+    header = {"version": CACHE_VERSION,
+              "signature": source_signature(directory)}
+
+    if not rebuild:
+        graph = read_snapshot(path, header)
+        if graph is not None:
+            return graph
+
+    graph = load_graph(directory)
+    write_snapshot(path, header, graph)
+    return graph
+
+
+def load_cached_oracle(graph, directory, k):
+    """
+    Returns a LandmarkOracle over k landmarks for the Graph loaded from
+    `directory`, reading its distance tables from the landmark snapshot
+    when they were built from the same CSV files, and building (and
+    saving) them otherwise. Call it before applying any delta.
+    """
+    path = os.path.join(directory, LANDMARKS_NAME)
+    header = {"version": CACHE_VERSION,
+              "signature": source_signature(directory), "landmarks": k}
+    tables = read_snapshot(path, header)
+    if tables is not None:
+        return LandmarkOracle(graph, k, tables)
+
+    oracle = LandmarkOracle(graph, k)
+    write_snapshot(path, header, (oracle.landmarks, oracle.distances))
+    return oracle
+
+
+def cache_path(directory):
+    return os.path.join(directory, CACHE_NAME)
+
+
+def source_signature(directory):
+    """
+    Returns (filename, mtime, size) for each source CSV file.
+    """
+    signature = []
+    for filename in SOURCES:
+        stat = os.stat(os.path.join(directory, filename))
+        signature.append((filename, stat.st_mtime_ns, stat.st_size))
+    return tuple(signature)
+
+
+def read_snapshot(path, header):
+    """
+    Returns the object cached after `header`, or None if the snapshot
+    is missing, unreadable or stale.
+    """
+    try:
+        with open(path, "rb") as f:
+            if pickle.load(f) != header:
+                return None
+            return pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError):
+        return None
+
+
+def write_snapshot(path, header, value):
+    """
+    Atomically replaces the snapshot at `path`.
+    A read-only data directory simply goes without a cache.
+    """
+    directory, name = os.path.split(path)
+    try:
+        fd, temp = tempfile.mkstemp(dir=directory or ".", prefix=name)
+    except OSError:
+        return
+    try:
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump(header, f, protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp, path)
+    except OSError:
+        os.unlink(temp)
@@ -0,0 +1,164 @@
+"""
+Co-star adjacency for the compact Graph.
+
+Graph.neighbors walks every movie of a person and every star of each
+movie, yielding one pair per shared movie. Both classes here instead
+return each co-star once, with one representative movie, so hub actors
+are not re-expanded movie by movie. Their `neighbors` methods can be
+passed to any search engine in place of Graph.neighbors.
+
+Both subscribe to the graph, so rows touched by later updates are
+recomputed on their next use while every other row stays warm.
+"""
+
+import time
+from array import array
+from collections import OrderedDict
+
+
+def costars_of(graph, person):
+    """
+    Returns (movie, person) pairs for each distinct co-star of a person,
+    keeping the first movie they shared.
+    """
+    seen = {}
+    for movie, other in graph.neighbors(person):
+        if other != person and other not in seen:
+            seen[other] = movie
+    return seen
+
+
+class CostarIndex():
+    """
+    Co-stars of every person, precomputed once into CSR arrays.
+    """
+
+    def __init__(self, graph):
+        start = time.perf_counter()
+        self.offsets = array("q", [0])
+        self.costars = array("i")
+        self.movies = array("i")
+        for person in range(graph.person_count):
+            seen = costars_of(graph, person)
+            self.costars.extend(seen.keys())
+            self.movies.extend(seen.values())
+            self.offsets.append(len(self.costars))
+        self.build_seconds = time.perf_counter() - start
+        self.lookups = 0
+
+        # Rows replaced since the build; None until next recomputed
+        self.overrides = {}
+        graph.subscribe(self)
+        self.graph = graph
+
+    def graph_changed(self, people):
+        for person in people:
+            self.overrides[person] = None
+
+    def neighbors(self, person):
+        self.lookups += 1
+        if person in self.overrides:
+            row = self.overrides[person]
+            if row is None:
+                seen = costars_of(self.graph, person)
+                row = self.overrides[person] = tuple(zip(seen.values(), seen.keys()))
+            return row
+        start, end = self.offsets[person], self.offsets[person + 1]
+        return zip(self.movies[start:end], self.costars[start:end])
+
+    def stats(self):
+        size = sum(
+            table.buffer_info()[1] * table.itemsize
+            for table in (self.offsets, self.costars, self.movies)
+        )
+        return {
+            "kind": "index",
+            "build_seconds": self.build_seconds,
+            "entries": len(self.costars),
+            "bytes": size,
+            "lookups": self.lookups,
+            "overrides": len(self.overrides),
+            "hit_rate": 1.0,
+        }
+
+
+class CostarCache():
+    """
+    Co-stars computed on demand and kept for the `maxsize` most
+    recently used people.
+    """
+
+    def __init__(self, graph, maxsize):
+        self.graph = graph
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        # time spent computing the rows that missed
+        self.build_seconds = 0.0
+        graph.subscribe(self)
+
+    def graph_changed(self, people):
+        for person in people:
+            self.entries.pop(person, None)
+
+    def neighbors(self, person):
+        entries = self.entries
+        if person in entries:
+            self.hits += 1
+            entries.move_to_end(person)
+            return entries[person]
+
+        self.misses += 1
+        start = time.perf_counter()
+        seen = costars_of(self.graph, person)
+        row = tuple(zip(seen.values(), seen.keys()))
+        self.build_seconds += time.perf_counter() - start
+
+        entries[person] = row
+        if len(entries) > self.maxsize:
+            entries.popitem(last=False)
+        return row
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "kind": "cache",
+            "build_seconds": self.build_seconds,
+            "entries": len(self.entries),
+            "maxsize": self.maxsize,
+            "lookups": lookups,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
+
+
+def merge_stats(reports):
+    """
+    Combines stats() reports from several worker processes.
+    Forked workers share one index, so its size is counted once.
+    """
+    merged = dict(reports[0])
+    shared = ("build_seconds", "entries", "bytes", "overrides")
+    for report in reports[1:]:
+        for key, value in report.items():
+            if key in ("kind", "hit_rate", "maxsize"):
+                continue
+            if merged["kind"] == "index" and key in shared:
+                continue
+            merged[key] += value
+    if merged["kind"] == "cache":
+        lookups = merged["lookups"]
+        merged["hit_rate"] = merged["hits"] / lookups if lookups else 0.0
+    return merged
+
+
+def print_stats(stats, file):
+    print(f"Co-star {stats['kind']}:", file=file)
+    for key, value in stats.items():
+        if key == "kind":
+            continue
+        if isinstance(value, float):
+            value = f"{value:.3f}"
+        print(f"  {key}: {value}", file=file)
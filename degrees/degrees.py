@@ -2,10 +2,19 @@
 Date created: 24/12/2025
 """
 
+import argparse
 import csv
+import itertools
+import math
 import sys
 
-from util import Node, StackFrontier, QueueFrontier
+import batch
+import costars
+import paths
+from cache import load_cached_graph, load_cached_oracle
+from graph import read_delta
+from nameindex import NameIndex
+from search import SearchStats, bidirectional_search
 
 # Maps names to a set of corresponding person_ids
 names = {}
@@ -57,84 +66,186 @@ def load_data(directory):
 
 
 def main():
-    if len(sys.argv) > 2:
-        sys.exit("Usage: python degrees.py [directory]")
-    directory = sys.argv[1] if len(sys.argv) == 2 else "large"
-
-    # Load data from files into memory
-    print("Loading data...")
-    load_data(directory)
-    print("Data loaded.")
-
-    source = person_id_for_name(input("Name: "))
+    parser = argparse.ArgumentParser(description="Degrees of separation.")
+    parser.add_argument("directory", nargs="?", default="large")
+    parser.add_argument("--rebuild-cache", action="store_true",
+                        help="re-parse the CSV files and rewrite the snapshot")
+    parser.add_argument("--delta", metavar="DIR", action="append", default=[],
+                        help="apply the CSV files in DIR on top of the data "
+                             "(may be repeated)")
+    parser.add_argument("--batch", metavar="FILE",
+                        help="answer source,target queries from FILE "
+                             "('-' for stdin) instead of prompting")
+    parser.add_argument("--format", choices=["csv", "jsonl"],
+                        help="batch input and output format "
+                             "(default: from the file extension, else csv)")
+    parser.add_argument("--output", metavar="FILE",
+                        help="write batch answers to FILE instead of stdout")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="answer batch sources in this many processes")
+    parser.add_argument("--costar-index", action="store_true",
+                        help="precompute every person's co-stars at load time")
+    parser.add_argument("--costar-cache", type=int, metavar="N",
+                        help="cache the co-stars of the N most recently "
+                             "expanded people instead")
+    parser.add_argument("--landmarks", type=int, default=0, metavar="K",
+                        help="bound and guide the search with distances "
+                             "from K landmark actors")
+    parser.add_argument("--paths", type=int, default=0, metavar="N",
+                        help="list up to N alternative paths, shortest first")
+    parser.add_argument("--all-shortest", action="store_true",
+                        help="with --paths, list only minimum-length paths")
+    parser.add_argument("--from-year", type=int,
+                        help="with --paths, only use movies from this year on")
+    parser.add_argument("--to-year", type=int,
+                        help="with --paths, only use movies up to this year")
+    parser.add_argument("--best-match", action="store_true",
+                        help="resolve ambiguous or misspelled batch names to "
+                             "the closest match with the most movies")
+    parser.add_argument("--profile", metavar="FILE",
+                        help="write each query's search counters to FILE "
+                             "as JSON lines ('-' for stderr)")
+    args = parser.parse_args()
+    if args.paths and args.profile:
+        parser.error("--profile does not apply to --paths")
+
+    # Progress goes to stderr when stdout carries batch answers
+    log = sys.stderr if args.batch else sys.stdout
+
+    # Load data from the snapshot, or from files on first run
+    print("Loading data...", file=log)
+    graph = load_cached_graph(args.directory, rebuild=args.rebuild_cache)
+    # Landmark tables come from their own snapshot; a delta makes them
+    # stale, so they are rebuilt on first use
+    oracle = None
+    if args.landmarks:
+        oracle = load_cached_oracle(graph, args.directory, args.landmarks)
+    deltas = [read_delta(directory) for directory in args.delta]
+    for delta in deltas:
+        graph.apply_delta(delta)
+    print("Data loaded.", file=log)
+
+    profile = None
+    if args.profile == "-":
+        profile = sys.stderr
+    elif args.profile:
+        profile = open(args.profile, "w", encoding="utf-8")
+    try:
+        answer(args, graph, oracle, deltas, profile, log)
+    finally:
+        if profile not in (None, sys.stderr):
+            profile.close()
+
+
+def answer(args, graph, oracle, deltas, profile, log):
+    """
+    Answers the batch, or the one query prompted for, that `args` ask
+    for. Search counters go to the `profile` file when given.
+    """
+    # Optionally expand people through deduplicated co-star lists
+    index = None
+    if args.costar_index:
+        index = costars.CostarIndex(graph)
+    elif args.costar_cache:
+        index = costars.CostarCache(graph, args.costar_cache)
+
+    if args.batch:
+        names = NameIndex(graph) if args.best_match else None
+        fmt = args.format or ("jsonl" if args.batch.endswith(".jsonl") else "csv")
+        stream = sys.stdin if args.batch == "-" else open(args.batch, encoding="utf-8")
+        out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+        try:
+            if args.workers > 1:
+                summary = batch.run_parallel_batch(
+                    graph, args.directory, stream, out, fmt, args.workers,
+                    index, names, profile, deltas
+                )
+            else:
+                summary = batch.run_batch(graph, stream, out, fmt, index, names,
+                                          profile)
+        finally:
+            # Only close what was opened here, not stdin or stdout
+            if stream is not sys.stdin:
+                stream.close()
+            if out is not sys.stdout:
+                out.close()
+        batch.print_summary(summary)
+        if index:
+            stats = summary.get("costars") or index.stats()
+            costars.print_stats(stats, file=log)
+        return
+
+    source = person_for_name(graph, input("Name: "))
     if source is None:
         sys.exit("Person not found.")
-    target = person_id_for_name(input("Name: "))
+    target = person_for_name(graph, input("Name: "))
     if target is None:
         sys.exit("Person not found.")
 
-    path = shortest_path(source, target)
+    neighbors = index.neighbors if index else None
+    if args.paths:
+        movie_filter = None
+        if args.from_year is not None or args.to_year is not None:
+            movie_filter = paths.years_between(graph, args.from_year, args.to_year)
+        enumerate_paths = (
+            paths.all_shortest_paths if args.all_shortest else paths.shortest_paths
+        )
+        found = enumerate_paths(graph, source, target, neighbors, movie_filter)
+        count = 0
+        for path in itertools.islice(found, args.paths):
+            count += 1
+            print(f"Path {count}:")
+            print_path(graph, source, path)
+        if count == 0:
+            print("Not connected.")
+        return
+
+    stats = SearchStats() if profile else None
+    if oracle:
+        lower, upper = oracle.bounds(source, target)
+        if lower == math.inf:
+            print("Landmark bounds: provably not connected.")
+        elif upper == math.inf:
+            print("Landmark bounds: no landmark reaches both.")
+        else:
+            print(f"Landmark bounds: {lower} to {upper} degrees.")
+        path = oracle.shortest_path(source, target, neighbors, stats=stats)
+    else:
+        path = graph.shortest_path(source, target, neighbors, stats)
 
     if path is None:
         print("Not connected.")
     else:
-        degrees = len(path)
-        print(f"{degrees} degrees of separation.")
-        path = [(None, source)] + path
-        for i in range(degrees):
-            person1 = people[path[i][1]]["name"]
-            person2 = people[path[i + 1][1]]["name"]
-            movie = movies[path[i + 1][0]]["title"]
-            print(f"{i + 1}: {person1} and {person2} starred in {movie}")
+        print_path(graph, source, path)
+
+    if stats:
+        stats.emit(profile, source=graph.person_ids[source],
+                   target=graph.person_ids[target],
+                   degrees=None if path is None else len(path))
+    if index:
+        costars.print_stats(index.stats(), file=log)
 
 
-def shortest_path(source, target):
+def print_path(graph, source, path):
+    degrees = len(path)
+    print(f"{degrees} degrees of separation.")
+    path = [(None, source)] + path
+    for i in range(degrees):
+        person1 = graph.name(path[i][1])
+        person2 = graph.name(path[i + 1][1])
+        movie = graph.title(path[i + 1][0])
+        print(f"{i + 1}: {person1} and {person2} starred in {movie}")
+
+
+def shortest_path(source, target, stats=None):
     """
     Returns the shortest list of (movie_id, person_id) pairs
     that connect the source to the target.
 
-    If no possible path, returns None.
+    If no possible path, returns None. Pass a SearchStats as `stats`
+    to have the search's counters recorded in it.
     """
-    # Initialize a frontier to the starting position ONLY
-    start = Node(state=source, parent=None, action=None)
-    # add start to the frontier List
-    front = StackFrontier()
-    front.add(start)
-
-    explore = set()
-    # loop until a target is found
-    while True:
-
-        # if there is nothing left in a frontier, then there is no path
-        if front.empty():
-            return None
-
-        # choose a node from the frontier
-        node = front.remove()
-
-        # if the given node is the goal, a solution is found
-        if node.state == target:
-            path = []
-
-            # track the path from the target to the source
-            while node.parent is not None:
-                # add movies and person Id
-                path.append((node.action, node.state))
-                node = node.parent
-
-            # reverse the path list
-            path.reverse()
-
-            return path
-
-        # add the node to the explored set
-        explore.add(node.state)
-
-        # add the node neighbor to the frontier
-        for action, state in neighbors_for_person(node.state):
-            if not front.contains_state(state) and state not in explore:
-                neighbor = Node(state=state, parent=node, action=action)
-                front.add(neighbor)
+    return bidirectional_search(source, target, neighbors_for_person, stats)
 
 
 def person_id_for_name(name):
@@ -167,6 +278,29 @@ def person_id_for_name(name):
         return people_list[0]
 
 
+def person_for_name(graph, name):
+    """
+    Returns the graph index for a person's name,
+    resolving ambiguities as needed.
+    """
+    matches = graph.people_named(name)
+    if len(matches) == 0:
+        return None
+    elif len(matches) > 1:
+        print(f"Which '{name}'?")
+        for person in matches:
+            person_id = graph.person_ids[person]
+            name = graph.name(person)
+            birth = graph.birth(person)
+            print(f"ID: {person_id}, Name: {name}, Birth: {birth}")
+        person = graph.person_index.get(input("Intended Person ID: "))
+        if person in matches:
+            return person
+        return None
+    else:
+        return matches[0]
+
+
 def neighbors_for_person(person_id):
     """
     Returns (movie_id, person_id) pairs for people
@@ -0,0 +1,382 @@
+"""
+Compact integer-indexed star graph for the degrees dataset.
+
+People and movies are interned to dense integers and the bipartite
+person/movie graph is kept as two compressed sparse row (CSR) tables:
+`person_offsets`/`person_movies` and `movie_offsets`/`movie_stars`.
+Row i of a table lives in the slice offsets[i]:offsets[i + 1].
+
+Names and titles are packed into StringColumns and birth and release
+years into 16-bit arrays, decoded only when asked for.
+
+People, movies and star edges added after loading (add_person,
+add_movie, add_star, apply_delta) go into small per-row overlays on
+top of the CSR tables. Objects holding data derived from the graph
+subscribe() to it and are told which people each change touched.
+"""
+
+import csv
+import os
+from array import array
+
+from search import bidirectional_search
+
+# Read buffer for the CSV files
+CHUNK_SIZE = 1 << 20
+
+# The files a delta directory may hold, and the columns kept from each
+DELTA_FILES = (
+    ("people", "people.csv", ("id", "name", "birth")),
+    ("movies", "movies.csv", ("id", "title", "year")),
+    ("stars", "stars.csv", ("person_id", "movie_id")),
+)
+
+
+class Graph():
+    def __init__(self):
+        # IMDB ids by index, and the reverse mapping
+        self.person_ids = []
+        self.person_index = {}
+        self.movie_ids = []
+        self.movie_index = {}
+
+        # Metadata, one entry per index; years are 0 when unknown
+        self.person_names = StringColumn()
+        self.person_births = array("H")
+        self.movie_titles = StringColumn()
+        self.movie_years = array("H")
+
+        # Maps lowercase names to a tuple of person indexes
+        self.names = {}
+
+        # CSR adjacency in both directions
+        self.person_offsets = array("q", [0])
+        self.person_movies = array("i")
+        self.movie_offsets = array("q", [0])
+        self.movie_stars = array("i")
+
+        # Rows appended after loading, on top of the CSR tables
+        self.extra_movies = {}
+        self.extra_stars = {}
+
+        # Objects with a graph_changed(people) method
+        self.listeners = []
+
+    def __getstate__(self):
+        # Listeners belong to the running process, not to snapshots
+        state = dict(self.__dict__)
+        state["listeners"] = []
+        return state
+
+    @property
+    def person_count(self):
+        return len(self.person_ids)
+
+    @property
+    def movie_count(self):
+        return len(self.movie_ids)
+
+    def name(self, person):
+        return self.person_names[person]
+
+    def birth(self, person):
+        return _year_text(self.person_births[person])
+
+    def title(self, movie):
+        return self.movie_titles[movie]
+
+    def year(self, movie):
+        return _year_text(self.movie_years[movie])
+
+    def movies_of(self, person):
+        """
+        Returns the movie indexes a person starred in.
+        """
+        offsets = self.person_offsets
+        movies = self.person_movies[offsets[person]:offsets[person + 1]]
+        if person in self.extra_movies:
+            movies.extend(self.extra_movies[person])
+        return movies
+
+    def stars_of(self, movie):
+        """
+        Returns the person indexes that starred in a movie.
+        """
+        offsets = self.movie_offsets
+        stars = self.movie_stars[offsets[movie]:offsets[movie + 1]]
+        if movie in self.extra_stars:
+            stars.extend(self.extra_stars[movie])
+        return stars
+
+    def neighbors(self, person):
+        """
+        Yields (movie, person) index pairs for people who starred
+        with a given person, including the person itself.
+        """
+        for movie in self.movies_of(person):
+            for star in self.stars_of(movie):
+                yield movie, star
+
+    def people_named(self, name):
+        """
+        Returns the person indexes matching a name, ignoring case.
+        """
+        return self.names.get(name.lower(), ())
+
+    def shortest_path(self, source, target, neighbors=None, stats=None):
+        """
+        Returns the shortest list of (movie, person) index pairs that
+        connect the source to the target, or None if not connected.
+        Counters are recorded in the SearchStats `stats` when given.
+        """
+        return bidirectional_search(source, target, neighbors or self.neighbors,
+                                    stats)
+
+    def subscribe(self, listener):
+        self.listeners.append(listener)
+
+    def add_person(self, person_id, name, birth=""):
+        """
+        Adds a person, returning its index.
+        An existing id keeps its current index and metadata.
+        """
+        if person_id in self.person_index:
+            return self.person_index[person_id]
+        person = len(self.person_ids)
+        self.person_index[person_id] = person
+        self.person_ids.append(person_id)
+        self.person_names.append(name)
+        self.person_births.append(_year(birth))
+        self.person_offsets.append(self.person_offsets[-1])
+        key = name.lower()
+        self.names[key] = self.names.get(key, ()) + (person,)
+        self._notify({person})
+        return person
+
+    def add_movie(self, movie_id, title, year=""):
+        """
+        Adds a movie, returning its index.
+        An existing id keeps its current index and metadata.
+        """
+        if movie_id in self.movie_index:
+            return self.movie_index[movie_id]
+        movie = len(self.movie_ids)
+        self.movie_index[movie_id] = movie
+        self.movie_ids.append(movie_id)
+        self.movie_titles.append(title)
+        self.movie_years.append(_year(year))
+        self.movie_offsets.append(self.movie_offsets[-1])
+        return movie
+
+    def add_star(self, person_id, movie_id):
+        """
+        Records that a person starred in a movie.
+        Returns False if either is unknown or the edge already exists.
+        """
+        person = self.person_index.get(person_id)
+        movie = self.movie_index.get(movie_id)
+        if person is None or movie is None:
+            return False
+        if movie in self.movies_of(person):
+            return False
+
+        # Everyone already in the movie gains a co-star
+        touched = set(self.stars_of(movie))
+        touched.add(person)
+        self.extra_movies.setdefault(person, []).append(movie)
+        self.extra_stars.setdefault(movie, []).append(person)
+        self._notify(touched)
+        return True
+
+    def apply_delta(self, delta):
+        """
+        Applies the rows of a delta read by read_delta. Returns the
+        number of rows added from each of its files.
+        """
+        added = {}
+        if "people" in delta:
+            before = self.person_count
+            for row in delta["people"]:
+                self.add_person(*row)
+            added["people"] = self.person_count - before
+        if "movies" in delta:
+            before = self.movie_count
+            for row in delta["movies"]:
+                self.add_movie(*row)
+            added["movies"] = self.movie_count - before
+        if "stars" in delta:
+            added["stars"] = sum(self.add_star(*row) for row in delta["stars"])
+        return added
+
+    def _notify(self, people):
+        for listener in self.listeners:
+            listener.graph_changed(people)
+
+    def path_ids(self, path):
+        """
+        Translates an index path into (movie_id, person_id) pairs.
+        """
+        if path is None:
+            return None
+        return [
+            (self.movie_ids[movie], self.person_ids[person])
+            for movie, person in path
+        ]
+
+
+class StringColumn():
+    """
+    Many strings packed into one UTF-8 buffer plus an offsets array,
+    instead of one Python object each.
+    """
+
+    def __init__(self):
+        self.data = bytearray()
+        self.offsets = array("q", [0])
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return self.data[self.offsets[i]:self.offsets[i + 1]].decode("utf-8")
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def append(self, text):
+        self.data += text.encode("utf-8")
+        self.offsets.append(len(self.data))
+
+
+def load_graph(directory):
+    """
+    Load data from CSV files into a compact Graph.
+
+    Rows are streamed through csv.reader and only the columns the
+    graph keeps are converted, so memory stays close to the final
+    footprint while loading.
+    """
+    graph = Graph()
+
+    # Load people
+    for person_id, name, birth in _rows(directory, "people.csv",
+                                        ("id", "name", "birth")):
+        # duplicate ids keep their first row
+        if person_id in graph.person_index:
+            continue
+        graph.person_index[person_id] = len(graph.person_ids)
+        graph.person_ids.append(person_id)
+        graph.person_names.append(name)
+        graph.person_births.append(_year(birth))
+
+    # Load movies
+    for movie_id, title, year in _rows(directory, "movies.csv",
+                                       ("id", "title", "year")):
+        if movie_id in graph.movie_index:
+            continue
+        graph.movie_index[movie_id] = len(graph.movie_ids)
+        graph.movie_ids.append(movie_id)
+        graph.movie_titles.append(title)
+        graph.movie_years.append(_year(year))
+
+    _index_names(graph)
+
+    # Load stars as two parallel edge arrays
+    edge_people = array("i")
+    edge_movies = array("i")
+    person_index = graph.person_index
+    movie_index = graph.movie_index
+    for person_id, movie_id in _rows(directory, "stars.csv",
+                                     ("person_id", "movie_id")):
+        person = person_index.get(person_id)
+        movie = movie_index.get(movie_id)
+        if person is None or movie is None:
+            continue
+        edge_people.append(person)
+        edge_movies.append(movie)
+
+    _build_adjacency(graph, edge_people, edge_movies)
+    return graph
+
+
+def read_delta(directory):
+    """
+    Reads whichever of people.csv, movies.csv and stars.csv exist in
+    `directory`. Returns a dictionary mapping "people", "movies" and
+    "stars" to lists of row tuples, for Graph.apply_delta.
+    """
+    delta = {}
+    for key, filename, columns in DELTA_FILES:
+        if os.path.exists(f"{directory}/{filename}"):
+            delta[key] = list(_rows(directory, filename, columns))
+    return delta
+
+
+def _rows(directory, filename, columns):
+    """
+    Yields tuples of the named columns from a CSV file with a header.
+    """
+    with open(f"{directory}/{filename}", encoding="utf-8", newline="",
+              buffering=CHUNK_SIZE) as f:
+        reader = csv.reader(f)
+        header = next(reader, [])
+        positions = [header.index(column) for column in columns]
+        for row in reader:
+            if row:
+                yield tuple(row[i] for i in positions)
+
+
+def _year(text):
+    return int(text) if text.isdigit() else 0
+
+
+def _year_text(year):
+    return str(year) if year else ""
+
+
+def _index_names(graph):
+    names = {}
+    for person, name in enumerate(graph.person_names):
+        names.setdefault(name.lower(), []).append(person)
+    graph.names = {name: tuple(people) for name, people in names.items()}
+
+
+def _build_adjacency(graph, edge_people, edge_movies):
+    graph.person_offsets, graph.person_movies = _csr(
+        edge_people, edge_movies, graph.person_count
+    )
+    graph.movie_offsets, graph.movie_stars = _csr(
+        edge_movies, edge_people, graph.movie_count
+    )
+    # The edge list is no longer needed once both tables exist
+    del edge_people[:], edge_movies[:]
+
+
+def _csr(rows, cols, size):
+    """
+    Counting-sorts an edge list into CSR offsets and columns,
+    dropping duplicate edges within each row.
+    """
+    offsets = array("q", bytes(8 * (size + 1)))
+    for row in rows:
+        offsets[row + 1] += 1
+    for i in range(size):
+        offsets[i + 1] += offsets[i]
+
+    columns = array("i", bytes(4 * len(rows)))
+    fill = offsets[:-1]
+    for row, col in zip(rows, cols):
+        columns[fill[row]] = col
+        fill[row] += 1
+
+    # Compact each row in place, sorted and without duplicates
+    compact = array("q", [0])
+    end = 0
+    for i in range(size):
+        row = sorted(set(columns[offsets[i]:offsets[i + 1]]))
+        columns[end:end + len(row)] = array("i", row)
+        end += len(row)
+        compact.append(end)
+    del columns[end:]
+    return compact, columns
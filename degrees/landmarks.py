@@ -0,0 +1,232 @@
+"""
+Landmark (ALT) distance oracle for degrees of separation.
+
+BFS distances from k well-connected landmark actors are kept as one
+uint8 array per landmark. By the triangle inequality, for any person s
+and t and landmark L,
+
+    |d(L, s) - d(L, t)| <= d(s, t) <= d(L, s) + d(L, t)
+
+so a handful of array reads bound the separation of any pair without
+searching. The same bounds speed up exact queries: disconnected pairs
+are rejected without exploring a whole component, pairs whose bounds
+meet are answered by walking a landmark's table, and the lower bound
+serves as a consistent A* heuristic.
+"""
+
+import math
+from array import array
+
+from search import astar_search, bidirectional_search
+
+# Distance stored for people a landmark cannot reach
+UNREACHABLE = 255
+
+
+class LandmarkOracle():
+    def __init__(self, graph, k=16, tables=None):
+        """
+        Builds the distance tables, unless `tables` gives the
+        (landmarks, distances) of an earlier build on the same graph.
+        """
+        self.graph = graph
+        self.k = k
+        if tables is None:
+            self.build()
+        else:
+            self.replace(tables)
+        graph.subscribe(self)
+
+    def replace(self, tables):
+        """
+        Uses (landmarks, distances) tables built elsewhere for the
+        graph as it is now.
+        """
+        self.landmarks, self.distances = tables
+        self.stale = False
+
+    def build(self):
+        """
+        Chooses landmarks and runs one BFS from each.
+
+        Candidates are taken busiest first, skipping anyone within one
+        degree of a landmark already chosen so the landmarks spread out.
+        The old tables stay in place until the new ones are complete,
+        so a build can run in another thread while bounds are read.
+        """
+        graph = self.graph
+        order = sorted(range(graph.person_count),
+                       key=lambda p: -len(graph.movies_of(p)))
+        landmarks = []
+        distances = []
+        for person in order:
+            if len(landmarks) == self.k:
+                break
+            if any(d[person] <= 1 for d in distances):
+                continue
+            landmarks.append(person)
+            distances.append(self.bfs(person))
+        self.landmarks, self.distances = landmarks, distances
+        self.stale = False
+
+    def bfs(self, source):
+        """
+        Returns the distance from `source` to every person, capped at
+        UNREACHABLE - 1.
+        """
+        graph = self.graph
+        distances = array("B", [UNREACHABLE]) * graph.person_count
+        seen_movies = bytearray(graph.movie_count)
+        distances[source] = 0
+        frontier = [source]
+        depth = 0
+        while frontier:
+            depth = min(depth + 1, UNREACHABLE - 1)
+            next_frontier = []
+            for person in frontier:
+                for movie in graph.movies_of(person):
+                    if seen_movies[movie]:
+                        continue
+                    seen_movies[movie] = 1
+                    for star in graph.stars_of(movie):
+                        if distances[star] == UNREACHABLE:
+                            distances[star] = depth
+                            next_frontier.append(star)
+            frontier = next_frontier
+        return distances
+
+    def graph_changed(self, people):
+        # New edges can only shorten distances, which would break the
+        # lower bound, so the tables are rebuilt before their next use
+        self.stale = True
+
+    def bounds(self, source, target, rebuild=True):
+        """
+        Returns (lower, upper) bounds on the degrees of separation.
+        Both are math.inf when the two are provably not connected;
+        upper is math.inf when no landmark reaches them.
+
+        With `rebuild` false, tables that are stale are used as they
+        are rather than rebuilt. Since the graph has only gained edges
+        and people, their upper bound still holds but nothing else
+        does, so lower is 0.
+        """
+        if self.stale and rebuild:
+            self.build()
+        if source == target:
+            return 0, 0
+        stale = self.stale
+        lower, upper = 0, math.inf
+        for distances in self.distances:
+            if max(source, target) >= len(distances):
+                # Added since the tables were built
+                break
+            s, t = distances[source], distances[target]
+            if s == UNREACHABLE or t == UNREACHABLE:
+                if s == t or stale:
+                    continue
+                return math.inf, math.inf
+            if not stale:
+                lower = max(lower, abs(s - t))
+            upper = min(upper, s + t)
+        return lower, upper
+
+    def heuristic(self, target):
+        """
+        Returns an A* heuristic: a lower bound on the distance to
+        `target` (math.inf for people who cannot reach it).
+        """
+        if self.stale:
+            self.build()
+        rows = [(d, d[target]) for d in self.distances]
+
+        def estimate(person):
+            best = 0
+            for distances, t in rows:
+                s = distances[person]
+                if s != t and (s == UNREACHABLE or t == UNREACHABLE):
+                    return math.inf
+                if s != UNREACHABLE and abs(s - t) > best:
+                    best = abs(s - t)
+            return best
+
+        return estimate
+
+    def shortest_path(self, source, target, neighbors=None, method="auto",
+                      stats=None, rebuild=True):
+        """
+        Returns the shortest list of (movie, person) index pairs that
+        connect the source to the target, or None if not connected.
+
+        Pairs the bounds prove disconnected return at once. With the
+        default "auto" method, pairs whose bounds meet are answered by
+        walking down the distance table of the landmark that achieves
+        them; the rest use bidirectional search. "astar" runs A* guided
+        by the landmark lower bound instead. Only the bidirectional
+        search records counters in `stats`; otherwise its method is set
+        to "landmarks" or "astar".
+
+        With `rebuild` false, stale tables are not rebuilt: the
+        bidirectional search answers alone until they are replaced.
+        """
+        neighbors = neighbors or self.graph.neighbors
+        if self.stale and not rebuild:
+            return bidirectional_search(source, target, neighbors, stats)
+        lower, upper = self.bounds(source, target)
+        if lower == math.inf:
+            _answered(stats, "landmarks")
+            return None
+        if method == "astar":
+            _answered(stats, "astar")
+            return astar_search(source, target, neighbors,
+                                self.heuristic(target))
+        if lower == upper:
+            for distances in self.distances:
+                if distances[source] + distances[target] == upper:
+                    _answered(stats, "landmarks")
+                    return self.path_through(distances, source, target)
+        return bidirectional_search(source, target, neighbors, stats)
+
+    def path_through(self, distances, source, target):
+        """
+        Returns a path from source to target via the landmark whose
+        BFS distances are `distances`, by stepping down the table.
+        """
+        # source up to the landmark
+        path = []
+        state = source
+        while distances[state] != 0:
+            movie, state = self.step_down(distances, state)
+            path.append((movie, state))
+
+        # landmark down to target, found by walking up from the target
+        tail = []
+        state = target
+        while distances[state] != 0:
+            movie, parent = self.step_down(distances, state)
+            tail.append((movie, state))
+            state = parent
+        tail.reverse()
+        return path + tail
+
+    def step_down(self, distances, person):
+        """
+        Returns a (movie, co-star) pair one degree closer to the landmark.
+        """
+        graph = self.graph
+        closer = distances[person] - 1
+        for movie in graph.movies_of(person):
+            for star in graph.stars_of(movie):
+                if distances[star] == closer:
+                    return movie, star
+
+    def stats(self):
+        return {
+            "landmarks": [self.graph.person_ids[p] for p in self.landmarks],
+            "bytes": sum(len(d) for d in self.distances),
+        }
+
+
+def _answered(stats, method):
+    if stats is not None:
+        stats.method = method
@@ -0,0 +1,150 @@
+"""
+Name lookups over the compact Graph that never prompt.
+
+NameIndex keeps the distinct lowercase names in a sorted list for
+prefix search (bisect), and a trigram index over them for
+typo-tolerant search. Matches are returned as candidates ranked by
+how many movies each person starred in. People added to the graph
+later are indexed as they arrive.
+"""
+
+from array import array
+from bisect import bisect_left, insort
+
+# Minimum trigram Jaccard similarity for a fuzzy match
+THRESHOLD = 0.4
+
+
+def trigrams(text):
+    """
+    Returns the set of 3-character substrings of a padded name.
+    """
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class NameIndex():
+    def __init__(self, graph):
+        self.graph = graph
+
+        # Distinct lowercase names by key id, and in sorted order
+        self.keys = list(graph.names)
+        self.key_ids = {key: i for i, key in enumerate(self.keys)}
+        self.sorted_keys = sorted(self.keys)
+
+        # Maps each trigram to the ids of the keys containing it
+        postings = {}
+        for key_id, key in enumerate(self.keys):
+            for gram in trigrams(key):
+                postings.setdefault(gram, []).append(key_id)
+        self.postings = {
+            gram: array("i", key_ids) for gram, key_ids in postings.items()
+        }
+
+        self.indexed = graph.person_count
+        graph.subscribe(self)
+
+    def graph_changed(self, people):
+        """
+        Indexes the names of people added since the last change.
+        """
+        graph = self.graph
+        for person in range(self.indexed, graph.person_count):
+            key = graph.name(person).lower()
+            if key in self.key_ids:
+                continue
+            key_id = len(self.keys)
+            self.keys.append(key)
+            self.key_ids[key] = key_id
+            insort(self.sorted_keys, key)
+            for gram in trigrams(key):
+                self.postings.setdefault(gram, array("i")).append(key_id)
+        self.indexed = graph.person_count
+
+    def exact(self, name):
+        """
+        Returns the person indexes whose name matches, ignoring case.
+        """
+        return self.graph.people_named(name)
+
+    def prefix(self, prefix, limit=10):
+        """
+        Returns up to `limit` person indexes whose name starts with
+        `prefix`, in alphabetical order of name.
+        """
+        prefix = prefix.lower()
+        keys = self.sorted_keys
+        matches = []
+        position = bisect_left(keys, prefix)
+        while position < len(keys) and len(matches) < limit:
+            if not keys[position].startswith(prefix):
+                break
+            matches.extend(self.graph.names[keys[position]])
+            position += 1
+        return matches[:limit]
+
+    def fuzzy(self, name, limit=10, threshold=THRESHOLD):
+        """
+        Returns up to `limit` (similarity, person) pairs for names whose
+        trigram Jaccard similarity to `name` is at least `threshold`,
+        most similar first; every such pair when `limit` is None.
+        """
+        query = trigrams(name.lower())
+        grams = sorted(query, key=lambda g: len(self.postings.get(g, ())))
+
+        # A match shares at least `need` trigrams with the query, so it
+        # must contain one of the len(grams) - need + 1 rarest ones
+        need = max(1, int(threshold * len(grams) + 0.999))
+        candidates = set()
+        for gram in grams[:len(grams) - need + 1]:
+            candidates.update(self.postings.get(gram, ()))
+
+        scored = []
+        for key_id in candidates:
+            grams_of_key = trigrams(self.keys[key_id])
+            shared = len(query & grams_of_key)
+            score = shared / (len(query) + len(grams_of_key) - shared)
+            if score >= threshold:
+                scored.append((score, key_id))
+        scored.sort(reverse=True)
+
+        matches = []
+        for score, key_id in scored:
+            for person in self.graph.names[self.keys[key_id]]:
+                matches.append((score, person))
+        return matches if limit is None else matches[:limit]
+
+    def candidates(self, name, limit=10):
+        """
+        Returns candidate people for `name` as dicts, best first.
+
+        Exact matches come first, then fuzzy ones; within each, people
+        who starred in more movies rank higher.
+        """
+        graph = self.graph
+        exact = [(1.0, person) for person in self.exact(name)]
+        # Rank every close enough person before keeping `limit` of them
+        found = exact or self.fuzzy(name, limit=None)
+
+        movie_counts = {person: len(graph.movies_of(person)) for _, person in found}
+        found.sort(key=lambda match: (-match[0], -movie_counts[match[1]]))
+        return [
+            {
+                "person": person,
+                "id": graph.person_ids[person],
+                "name": graph.name(person),
+                "birth": graph.birth(person),
+                "movies": movie_counts[person],
+                "score": score,
+                "exact": bool(exact),
+            }
+            for score, person in found[:limit]
+        ]
+
+    def resolve(self, name):
+        """
+        Returns the person index of the best candidate for `name`,
+        or None if nothing is close enough.
+        """
+        found = self.candidates(name, limit=1)
+        return found[0]["person"] if found else None
@@ -0,0 +1,160 @@
+"""
+Lazy enumeration of alternative paths between two people.
+
+Both enumerators are generators over (movie, person) index paths, so
+callers can stop after the first few, e.g. with itertools.islice,
+without the full (possibly exponential) set ever being built.
+Either can be restricted to movies accepted by `movie_filter`.
+"""
+
+import heapq
+import itertools
+
+from search import bidirectional_search
+
+
+def years_between(graph, first=None, last=None):
+    """
+    Returns a movie filter accepting movies released from `first` to
+    `last` inclusive. Movies with no known year are rejected when
+    either end is given.
+    """
+    def accept(movie):
+        year = graph.movie_years[movie]
+        if year == 0:
+            return first is None and last is None
+        return ((first is None or year >= first)
+                and (last is None or year <= last))
+    return accept
+
+
+def filtered(neighbors, movie_filter):
+    """
+    Returns a neighbors function that skips movies the filter rejects.
+    """
+    if movie_filter is None:
+        return neighbors
+
+    def accepted(state):
+        for movie, person in neighbors(state):
+            if movie_filter(movie):
+                yield movie, person
+    return accepted
+
+
+def all_shortest_paths(graph, source, target, neighbors=None,
+                       movie_filter=None):
+    """
+    Yields every minimum-length path from source to target.
+
+    A breadth-first search from the source records, for each person,
+    every (movie, person) step into it from the previous level. The
+    paths are then read off that layer DAG backwards from the target,
+    depth first, one at a time.
+    """
+    neighbors = filtered(neighbors or graph.neighbors, movie_filter)
+    if source == target:
+        yield []
+        return
+
+    depth = {source: 0}
+    parents = {source: []}
+    frontier = [source]
+    level = 0
+    while frontier and target not in depth:
+        level += 1
+        next_frontier = []
+        for state in frontier:
+            for movie, person in neighbors(state):
+                if person not in depth:
+                    depth[person] = level
+                    parents[person] = []
+                    next_frontier.append(person)
+                if depth[person] == level:
+                    parents[person].append((movie, state))
+        frontier = next_frontier
+
+    if target not in depth:
+        return
+
+    # Depth-first walk from the target; every parent lies on a
+    # shortest path, so no branch is a dead end
+    suffix = []
+    stack = [iter(parents[target])]
+    while stack:
+        step = next(stack[-1], None)
+        if step is None:
+            stack.pop()
+            if suffix:
+                suffix.pop()
+            continue
+        movie, parent = step
+        child = target if not suffix else suffix[-1][2]
+        suffix.append((movie, child, parent))
+        if parent == source:
+            yield [(movie, child) for movie, child, _ in reversed(suffix)]
+            suffix.pop()
+        else:
+            stack.append(iter(parents[parent]))
+
+
+def shortest_paths(graph, source, target, neighbors=None, movie_filter=None):
+    """
+    Yields loopless paths from source to target in order of length
+    (Yen's algorithm). Paths through different movies count as
+    different paths.
+
+    Each new path costs one search per person on the previous path,
+    so this suits the first handful of alternatives rather than all
+    of them; use all_shortest_paths for every minimum-length path.
+    """
+    base = filtered(neighbors or graph.neighbors, movie_filter)
+    first = bidirectional_search(source, target, base)
+    if first is None:
+        return
+    yield first
+
+    found = [first]
+    seen = {tuple(first)}
+    candidates = []
+    counter = itertools.count()
+    while True:
+        previous = found[-1]
+        people = [source] + [person for _, person in previous]
+        for i in range(len(previous)):
+            spur = people[i]
+            root = previous[:i]
+
+            # Steps out of the spur already used by paths sharing this
+            # root, and the root's people, may not be reused
+            banned_steps = {
+                path[i] for path in found if len(path) > i and path[:i] == root
+            }
+            banned_people = set(people[:i])
+
+            def spur_neighbors(state, spur=spur, banned_steps=banned_steps,
+                               banned_people=banned_people):
+                for movie, person in base(state):
+                    if person in banned_people:
+                        continue
+                    if state == spur and (movie, person) in banned_steps:
+                        continue
+                    if person == spur and (movie, state) in banned_steps:
+                        continue
+                    yield movie, person
+
+            if spur in banned_people:
+                continue
+            tail = bidirectional_search(spur, target, spur_neighbors)
+            if tail is None:
+                continue
+            path = root + tail
+            if tuple(path) not in seen:
+                seen.add(tuple(path))
+                heapq.heappush(candidates, (len(path), next(counter), path))
+
+        if not candidates:
+            return
+        _, _, path = heapq.heappop(candidates)
+        found.append(path)
+        yield path
@@ -0,0 +1,309 @@
+"""
+Search engines shared by degrees.py and the tools built on top of it.
+
+Every engine takes a `neighbors` function mapping a state to an iterable
+of (action, state) pairs, so the same code runs over the dict-based
+`people`/`movies` structures and over the compact integer graph.
+
+bidirectional_search and BFSTree also take an optional SearchStats.
+Without one they do no bookkeeping beyond a single `is None` test per
+BFS level.
+"""
+
+import heapq
+import json
+import math
+import time
+from collections import OrderedDict
+
+
+class SearchStats():
+    """
+    Opt-in counters for one query: nodes expanded, the frontier's
+    high-water mark, time spent building neighbor sets, the size of
+    the explored set and total search time. `method` names what
+    answered the query; only "search" fills in the counters.
+    """
+
+    def __init__(self):
+        self.method = "search"
+        self.expanded = 0
+        self.frontier_high_water = 0
+        self.neighbor_seconds = 0.0
+        self.explored = 0
+        self.seconds = 0.0
+
+    def timed(self, neighbors):
+        """
+        Wraps a neighbors function to count and time each expansion.
+        """
+        def expand(state):
+            start = time.perf_counter()
+            result = list(neighbors(state))
+            self.neighbor_seconds += time.perf_counter() - start
+            self.expanded += 1
+            return result
+        return expand
+
+    def level(self, frontier, explored):
+        if frontier > self.frontier_high_water:
+            self.frontier_high_water = frontier
+        self.explored = explored
+
+    def as_dict(self):
+        return {
+            "method": self.method,
+            "expanded": self.expanded,
+            "frontier_high_water": self.frontier_high_water,
+            "neighbor_seconds": self.neighbor_seconds,
+            "explored": self.explored,
+            "seconds": self.seconds,
+        }
+
+    def emit(self, file, **fields):
+        """
+        Writes the counters, plus any identifying fields, as one JSON line.
+        """
+        file.write(json.dumps({**fields, **self.as_dict()}) + "\n")
+
+
+def bidirectional_search(source, target, neighbors, stats=None):
+    """
+    Returns the shortest list of (action, state) pairs that connect
+    the source to the target, or None if they are not connected.
+
+    Breadth-first search runs from both ends at once, one full level
+    at a time, always growing the side with the smaller frontier.
+    The graph must be undirected (co-starring is symmetric).
+    """
+    if stats is None:
+        return _bidirectional(source, target, neighbors, None)
+    start = time.perf_counter()
+    path = _bidirectional(source, target, stats.timed(neighbors), stats)
+    stats.seconds += time.perf_counter() - start
+    return path
+
+
+def _bidirectional(source, target, neighbors, stats):
+    if source == target:
+        return []
+
+    # Maps each reached state to the (action, state) pair one step
+    # closer to the side's origin
+    forward = {source: None}
+    backward = {target: None}
+    forward_frontier = [source]
+    backward_frontier = [target]
+
+    while forward_frontier and backward_frontier:
+        if stats is not None:
+            stats.level(len(forward_frontier) + len(backward_frontier),
+                        len(forward) + len(backward))
+
+        # grow the cheaper side
+        if len(forward_frontier) <= len(backward_frontier):
+            forward_frontier, meeting = _expand_level(
+                forward_frontier, forward, backward, neighbors
+            )
+        else:
+            backward_frontier, meeting = _expand_level(
+                backward_frontier, backward, forward, neighbors
+            )
+
+        if meeting is not None:
+            if stats is not None:
+                stats.level(0, len(forward) + len(backward))
+            return _join(meeting, forward, backward)
+
+    if stats is not None:
+        stats.level(0, len(forward) + len(backward))
+    return None
+
+
+def _expand_level(frontier, parents, other, neighbors):
+    """
+    Expand every state in `frontier` by one step.
+
+    Returns the next frontier and the first state reached that the
+    other side has already seen (or None). Because whole levels are
+    expanded, the first meeting is always on a minimal path.
+    """
+    next_frontier = []
+    for state in frontier:
+        for action, neighbor in neighbors(state):
+            if neighbor in parents:
+                continue
+            parents[neighbor] = (action, state)
+            if neighbor in other:
+                return next_frontier, neighbor
+            next_frontier.append(neighbor)
+    return next_frontier, None
+
+
+def _join(meeting, forward, backward):
+    """
+    Stitch the two half-paths that meet at `meeting` into one path.
+    """
+    # walk back from the meeting point to the source
+    path = []
+    state = meeting
+    while forward[state] is not None:
+        action, parent = forward[state]
+        path.append((action, state))
+        state = parent
+    path.reverse()
+
+    # walk on from the meeting point to the target
+    state = meeting
+    while backward[state] is not None:
+        action, child = backward[state]
+        path.append((action, child))
+        state = child
+
+    return path
+
+
+class BFSTree():
+    """
+    Breadth-first search tree grown lazily from a single source.
+
+    The tree only expands as far as the queries asked so far need,
+    and keeps its progress so later targets resume where the last
+    one stopped.
+    """
+
+    def __init__(self, source, neighbors):
+        self.source = source
+        self.neighbors = neighbors
+        self.parents = {source: None}
+        self.frontier = [source]
+        self.depth = 0
+
+    def path_to(self, target, stats=None):
+        """
+        Returns the shortest list of (action, state) pairs from the
+        source to `target`, or None if they are not connected.
+        With `stats`, counts only the growth this query caused.
+        """
+        if stats is not None:
+            start = time.perf_counter()
+            neighbors = self.neighbors
+            self.neighbors = stats.timed(neighbors)
+        try:
+            while target not in self.parents and self.frontier:
+                if stats is not None:
+                    stats.level(len(self.frontier), len(self.parents))
+                self.expand()
+        finally:
+            if stats is not None:
+                self.neighbors = neighbors
+                stats.level(len(self.frontier), len(self.parents))
+                stats.seconds += time.perf_counter() - start
+
+        if target not in self.parents:
+            return None
+
+        path = []
+        state = target
+        while self.parents[state] is not None:
+            action, parent = self.parents[state]
+            path.append((action, state))
+            state = parent
+        path.reverse()
+        return path
+
+    def expand(self):
+        """
+        Grows the tree by one full level.
+        """
+        parents = self.parents
+        next_frontier = []
+        for state in self.frontier:
+            for action, neighbor in self.neighbors(state):
+                if neighbor not in parents:
+                    parents[neighbor] = (action, state)
+                    next_frontier.append(neighbor)
+        self.frontier = next_frontier
+        self.depth += 1
+
+
+class TreeCache():
+    """
+    The BFSTrees of the `maxsize` most recently queried sources.
+
+    Subscribe it to a Graph so that updates drop only the trees that
+    reached a person the change touched; trees that never got that far
+    are unaffected and stay warm.
+    """
+
+    def __init__(self, neighbors, maxsize):
+        self.neighbors = neighbors
+        self.maxsize = maxsize
+        self.trees = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.invalidated = 0
+
+    def path(self, source, target):
+        tree = self.trees.get(source)
+        if tree is None:
+            self.misses += 1
+            tree = self.trees[source] = BFSTree(source, self.neighbors)
+            if len(self.trees) > self.maxsize:
+                self.trees.popitem(last=False)
+        else:
+            self.hits += 1
+            self.trees.move_to_end(source)
+        return tree.path_to(target)
+
+    def graph_changed(self, states):
+        stale = [
+            source for source, tree in self.trees.items()
+            if any(state in tree.parents for state in states)
+        ]
+        for source in stale:
+            del self.trees[source]
+        self.invalidated += len(stale)
+
+
+def astar_search(source, target, neighbors, heuristic):
+    """
+    Returns the shortest list of (action, state) pairs that connect
+    the source to the target, or None if they are not connected.
+
+    Every step costs one, and `heuristic(state)` must never overstate
+    the number of steps left to the target (and, for the first visit
+    of a state to be final, be consistent).
+    """
+    parents = {source: None}
+    cost = {source: 0}
+    closed = set()
+    # ties on f prefer deeper states, which are closer to the target
+    heap = [(heuristic(source), 0, source)]
+
+    while heap:
+        _, negative_depth, state = heapq.heappop(heap)
+        if state in closed:
+            continue
+        if state == target:
+            path = []
+            while parents[state] is not None:
+                action, parent = parents[state]
+                path.append((action, state))
+                state = parent
+            path.reverse()
+            return path
+        closed.add(state)
+
+        depth = -negative_depth + 1
+        for action, neighbor in neighbors(state):
+            if neighbor in closed or cost.get(neighbor, depth + 1) <= depth:
+                continue
+            estimate = heuristic(neighbor)
+            if estimate == math.inf:
+                continue
+            cost[neighbor] = depth
+            parents[neighbor] = (action, state)
+            heapq.heappush(heap, (depth + estimate, -depth, neighbor))
+
+    return None
@@ -0,0 +1,470 @@
+"""
+Long-running degrees query server.
+
+Usage: python server.py [directory] [--port PORT | --unix PATH] [--workers N]
+
+The graph is loaded once and kept warm. Requests are plain HTTP GETs:
+
+    /path?source=<id or name>&target=<id or name>
+    /lookup?name=<name>[&mode=exact|prefix|fuzzy][&limit=N]
+    /paths?source=...&target=...[&limit=N][&mode=all|k][&from_year=Y][&to_year=Y]
+    /distance?source=<id or name>&target=<id or name>   (with --landmarks)
+    /stats
+
+plus POST /delta?directory=<dir> to apply delta CSV files to the live
+graph.
+
+Searches run in a pool of worker processes forked after the graph is
+loaded, so the event loop never blocks on one and the workers share
+the graph copy-on-write. /stats reports latency percentiles.
+
+A delta is read and applied in a thread, one at a time, while the
+server keeps answering. Its parsed rows are written once to a numbered
+file in a spool directory, and each search carries only the number of
+deltas applied so far; a worker that is behind reads the missing ones
+from the spool and replays them on its own copy of the graph, which
+invalidates only the cached trees and co-star rows they touch.
+"""
+
+import argparse
+import asyncio
+import concurrent.futures
+import gc
+import itertools
+import json
+import math
+import multiprocessing
+import os
+import pickle
+import shutil
+import signal
+import sys
+import tempfile
+import time
+import traceback
+from collections import deque
+from urllib.parse import parse_qs, urlsplit
+
+import costars
+import paths
+from batch import latency_summary, resolve
+from cache import load_cached_graph, load_cached_oracle
+from graph import read_delta
+from nameindex import NameIndex
+from search import TreeCache
+
+# Latencies kept per endpoint for /stats
+WINDOW = 10000
+
+# Graph, optional co-star index and landmark oracle used by the search
+# workers, the worker's BFS tree cache, how many deltas its graph has
+# seen, and the directory the deltas are spooled to
+_graph = None
+_index = None
+_oracle = None
+_trees = None
+_applied = 0
+_spool = None
+
+
+def _init_worker(directory, costar_index, landmarks, tree_cache, spool):
+    """
+    Platforms without fork load the graph from the snapshot instead.
+    """
+    global _graph, _index, _oracle, _trees, _applied, _spool
+    if _graph is None:
+        _graph = load_cached_graph(directory)
+        _index = costars.CostarIndex(_graph) if costar_index else None
+        _oracle = (load_cached_oracle(_graph, directory, landmarks)
+                   if landmarks else None)
+        _applied = 0
+        _spool = spool
+    if tree_cache:
+        neighbors = _index.neighbors if _index else _graph.neighbors
+        _trees = TreeCache(neighbors, tree_cache)
+        _graph.subscribe(_trees)
+
+
+def _spool_path(spool, number, kind="delta"):
+    return os.path.join(spool, f"{number}.{kind}")
+
+
+def _catch_up(deltas):
+    """
+    Reads from the spool, and applies, whichever of the first `deltas`
+    deltas this worker's graph has not seen yet. The landmark tables
+    the parent rebuilt after the last of them replace the stale ones.
+    """
+    global _applied
+    if _applied == deltas:
+        return
+    while _applied < deltas:
+        with open(_spool_path(_spool, _applied), "rb") as f:
+            _graph.apply_delta(pickle.load(f))
+        _applied += 1
+    if _oracle is not None:
+        with open(_spool_path(_spool, deltas - 1, "landmarks"), "rb") as f:
+            _oracle.replace(pickle.load(f))
+
+
+def _search(source, target, deltas):
+    """
+    Runs in a worker process. Returns the path as index pairs.
+    """
+    _catch_up(deltas)
+    if _trees is not None:
+        return _trees.path(source, target)
+    neighbors = _index.neighbors if _index else None
+    if _oracle is not None:
+        # Never rebuild the tables while a user waits
+        return _oracle.shortest_path(source, target, neighbors,
+                                     rebuild=False)
+    return _graph.shortest_path(source, target, neighbors)
+
+
+def _enumerate(source, target, deltas, mode, limit, first, last):
+    """
+    Runs in a worker process. Returns up to `limit` alternative paths.
+    """
+    _catch_up(deltas)
+    movie_filter = None
+    if first is not None or last is not None:
+        movie_filter = paths.years_between(_graph, first, last)
+    enumerate_paths = (
+        paths.all_shortest_paths if mode == "all" else paths.shortest_paths
+    )
+    found = enumerate_paths(_graph, source, target,
+                            _index.neighbors if _index else None, movie_filter)
+    return list(itertools.islice(found, limit))
+
+
+class Server():
+    def __init__(self, graph, directory, workers, index=None, tree_cache=0,
+                 oracle=None):
+        global _graph, _index, _oracle, _spool
+        self.graph = graph
+        self.names = NameIndex(graph)
+        self.oracle = oracle
+        self.latencies = {}
+
+        # Where parsed deltas are spooled for the workers, how many have
+        # been applied, the people they leave the graph with, and a lock
+        # that applies them one at a time
+        self.spool = tempfile.mkdtemp(prefix="degrees-deltas-")
+        self.deltas = 0
+        self.person_count = graph.person_count
+        self.delta_lock = asyncio.Lock()
+
+        # Publish the graph before forking so workers inherit it
+        _graph, _index, _oracle, _spool = graph, index, oracle, self.spool
+        gc.freeze()
+        methods = multiprocessing.get_all_start_methods()
+        self.pool = concurrent.futures.ProcessPoolExecutor(
+            workers,
+            mp_context=multiprocessing.get_context(
+                "fork" if "fork" in methods else "spawn"
+            ),
+            initializer=_init_worker,
+            initargs=(directory, index is not None,
+                      oracle.k if oracle else 0, tree_cache, self.spool),
+        )
+        # Start the workers now, before the event loop is running
+        self.pool.submit(int).result()
+
+    async def handle(self, reader, writer):
+        """
+        Answers one HTTP request and closes the connection.
+        """
+        start = time.perf_counter()
+        endpoint = None
+        try:
+            request = (await reader.readline()).decode("latin-1").split()
+            while (await reader.readline()).strip():
+                pass
+            if len(request) != 3 or request[0] not in ("GET", "POST"):
+                status, body = 405, {"error": "only GET and POST are supported"}
+            else:
+                url = urlsplit(request[1])
+                endpoint = url.path
+                params = {k: v[-1] for k, v in parse_qs(url.query).items()}
+                if (request[0] == "POST") != (endpoint == "/delta"):
+                    status, body = 405, {"error": f"wrong method for {endpoint}"}
+                else:
+                    status, body = await self.route(endpoint, params)
+        except (ValueError, ConnectionError) as e:
+            status, body = 400, {"error": str(e)}
+        except Exception as e:
+            # A failed search, or a worker that died, still gets the
+            # client an answer
+            traceback.print_exc()
+            status, body = 500, {"error": f"{type(e).__name__}: {e}"}
+
+        payload = json.dumps(body).encode("utf-8")
+        writer.write(
+            f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n"
+            "Content-Type: application/json\r\n"
+            f"Content-Length: {len(payload)}\r\n"
+            "Connection: close\r\n\r\n".encode("latin-1") + payload
+        )
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+        if endpoint in ROUTES:
+            window = self.latencies.setdefault(endpoint, deque(maxlen=WINDOW))
+            window.append(time.perf_counter() - start)
+
+    async def route(self, endpoint, params):
+        if endpoint == "/path":
+            return await self.path(params)
+        if endpoint == "/lookup":
+            return self.lookup(params)
+        if endpoint == "/paths":
+            return await self.paths(params)
+        if endpoint == "/distance":
+            return self.distance(params)
+        if endpoint == "/stats":
+            return self.stats()
+        if endpoint == "/delta":
+            return await self.delta(params)
+        return 404, {"error": f"unknown endpoint: {endpoint}"}
+
+    def endpoints(self, params):
+        """
+        Resolves the source and target parameters to person indexes.
+        Returns (source, target, None) or (None, None, error response).
+        """
+        try:
+            source = resolve(self.graph, params["source"], self.names)
+            target = resolve(self.graph, params["target"], self.names)
+        except KeyError as e:
+            return None, None, (400, {"error": f"missing parameter: {e.args[0]}"})
+        except ValueError as e:
+            return None, None, (404, {"error": str(e)})
+        # People from a delta still being applied are unknown to workers
+        for key, person in (("source", source), ("target", target)):
+            if person >= self.person_count:
+                error = f"person not found: {params[key]}"
+                return None, None, (404, {"error": error})
+        return source, target, None
+
+    async def path(self, params):
+        graph = self.graph
+        source, target, error = self.endpoints(params)
+        if error:
+            return error
+
+        loop = asyncio.get_running_loop()
+        path = await loop.run_in_executor(
+            self.pool, _search, source, target, self.deltas
+        )
+
+        return 200, {
+            "source": graph.person_ids[source],
+            "target": graph.person_ids[target],
+            "degrees": None if path is None else len(path),
+            "path": None if path is None else self.describe_path(path),
+        }
+
+    async def paths(self, params):
+        graph = self.graph
+        source, target, error = self.endpoints(params)
+        if error:
+            return error
+        mode = params.get("mode", "k")
+        if mode not in ("all", "k"):
+            return 400, {"error": f"unknown mode: {mode}"}
+        limit = int(params.get("limit", 10))
+        first = int(params["from_year"]) if "from_year" in params else None
+        last = int(params["to_year"]) if "to_year" in params else None
+
+        loop = asyncio.get_running_loop()
+        found = await loop.run_in_executor(
+            self.pool, _enumerate, source, target, self.deltas,
+            mode, limit, first, last
+        )
+        return 200, {
+            "source": graph.person_ids[source],
+            "target": graph.person_ids[target],
+            "mode": mode,
+            "paths": [self.describe_path(path) for path in found],
+        }
+
+    def describe_path(self, path):
+        graph = self.graph
+        return [
+            {
+                "movie_id": graph.movie_ids[movie],
+                "title": graph.title(movie),
+                "person_id": graph.person_ids[person],
+                "name": graph.name(person),
+            }
+            for movie, person in path
+        ]
+
+    def distance(self, params):
+        """
+        Bounds the degrees of separation from the landmark tables alone.
+        Until the tables are rebuilt after a delta, only the upper bound
+        is given.
+        """
+        if self.oracle is None:
+            return 404, {"error": "start the server with --landmarks"}
+        source, target, error = self.endpoints(params)
+        if error:
+            return error
+        lower, upper = self.oracle.bounds(source, target, rebuild=False)
+        return 200, {
+            "source": self.graph.person_ids[source],
+            "target": self.graph.person_ids[target],
+            "connected": lower != math.inf,
+            "lower": None if lower == math.inf else lower,
+            "upper": None if upper == math.inf else upper,
+        }
+
+    def lookup(self, params):
+        if "name" not in params:
+            return 400, {"error": "missing parameter: name"}
+        name = params["name"]
+        mode = params.get("mode", "exact")
+        limit = int(params.get("limit", 10))
+
+        if mode == "exact":
+            matches = self.names.candidates(name, limit)
+            matches = [match for match in matches if match["exact"]]
+        elif mode == "prefix":
+            matches = [
+                self.describe(person) for person in self.names.prefix(name, limit)
+            ]
+        elif mode == "fuzzy":
+            matches = self.names.candidates(name, limit)
+        else:
+            return 400, {"error": f"unknown mode: {mode}"}
+
+        for match in matches:
+            match.pop("person", None)
+        return 200, {"name": name, "mode": mode, "matches": matches}
+
+    def describe(self, person):
+        graph = self.graph
+        return {
+            "id": graph.person_ids[person],
+            "name": graph.name(person),
+            "birth": graph.birth(person),
+            "movies": len(graph.movies_of(person)),
+        }
+
+    async def delta(self, params):
+        """
+        Reads delta CSV files and applies them to the graph in this
+        process, in a thread so that other requests are still answered.
+        Workers read the same rows from the spool before their next
+        search.
+        """
+        if "directory" not in params:
+            return 400, {"error": "missing parameter: directory"}
+        directory = params["directory"]
+        if not os.path.isdir(directory):
+            return 404, {"error": f"no such directory: {directory}"}
+        loop = asyncio.get_running_loop()
+        async with self.delta_lock:
+            added = await loop.run_in_executor(
+                None, self.apply_delta, directory
+            )
+            self.deltas += 1
+            self.person_count = self.graph.person_count
+        return 200, {"directory": directory, "added": added,
+                     "deltas": self.deltas}
+
+    def apply_delta(self, directory):
+        """
+        Runs in a thread. Spools the parsed delta as the next one and
+        returns the rows added, once the landmark tables are rebuilt
+        for the new graph and spooled for the workers too.
+        """
+        delta = read_delta(directory)
+        with open(_spool_path(self.spool, self.deltas), "wb") as f:
+            pickle.dump(delta, f, protocol=pickle.HIGHEST_PROTOCOL)
+        added = self.graph.apply_delta(delta)
+        if self.oracle is not None:
+            self.oracle.build()
+            tables = (self.oracle.landmarks, self.oracle.distances)
+            with open(_spool_path(self.spool, self.deltas, "landmarks"),
+                      "wb") as f:
+                pickle.dump(tables, f, protocol=pickle.HIGHEST_PROTOCOL)
+        return added
+
+    def close(self):
+        """
+        Stops the workers and removes the delta spool.
+        """
+        self.pool.shutdown(cancel_futures=True)
+        shutil.rmtree(self.spool, ignore_errors=True)
+
+    def stats(self):
+        return 200, {
+            endpoint: latency_summary(list(window))
+            for endpoint, window in self.latencies.items()
+        }
+
+
+ROUTES = ("/path", "/paths", "/lookup", "/distance", "/stats", "/delta")
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found",
+            405: "Method Not Allowed", 500: "Internal Server Error"}
+
+
+async def serve(server, host, port, unix):
+    if unix:
+        listener = await asyncio.start_unix_server(server.handle, path=unix)
+        where = unix
+    else:
+        listener = await asyncio.start_server(server.handle, host, port)
+        where = f"http://{host}:{port}"
+    print(f"Serving on {where}", file=sys.stderr)
+    async with listener:
+        await listener.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Degrees query server.")
+    parser.add_argument("directory", nargs="?", default="large")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8050)
+    parser.add_argument("--unix", metavar="PATH",
+                        help="listen on a Unix socket instead of TCP")
+    parser.add_argument("--workers", type=int, default=multiprocessing.cpu_count())
+    parser.add_argument("--costar-index", action="store_true",
+                        help="precompute every person's co-stars at load time")
+    parser.add_argument("--tree-cache", type=int, default=0, metavar="N",
+                        help="keep BFS trees for the N most recent sources "
+                             "in each worker")
+    parser.add_argument("--landmarks", type=int, default=0, metavar="K",
+                        help="precompute distances from K landmark actors "
+                             "for /distance and landmark-guided searches")
+    args = parser.parse_args()
+
+    print("Loading data...", file=sys.stderr)
+    graph = load_cached_graph(args.directory)
+    index = costars.CostarIndex(graph) if args.costar_index else None
+    oracle = None
+    if args.landmarks:
+        oracle = load_cached_oracle(graph, args.directory, args.landmarks)
+    print("Data loaded.", file=sys.stderr)
+
+    server = Server(graph, args.directory, args.workers, index,
+                    args.tree_cache, oracle)
+
+    # Shut the worker pool down on SIGTERM as well as Ctrl-C
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        asyncio.run(serve(server, args.host, args.port, args.unix))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+
+
+if __name__ == "__main__":
+    main()
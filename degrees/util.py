@@ -1,3 +1,6 @@
+from collections import deque
+
+
 class Node():
     def __init__(self, state, parent, action):
         self.state = state
@@ -36,3 +39,82 @@ class QueueFrontier(StackFrontier):
             node = self.frontier[0]
             self.frontier = self.frontier[1:]
             return node
+
+
+class DequeStackFrontier():
+    def __init__(self):
+        self.frontier = deque()
+        # number of nodes in the frontier for each state
+        self.states = {}
+
+    def add(self, node):
+        self.frontier.append(node)
+        self.states[node.state] = self.states.get(node.state, 0) + 1
+
+    def contains_state(self, state):
+        return state in self.states
+
+    def empty(self):
+        return len(self.frontier) == 0
+
+    def remove(self):
+        if self.empty():
+            raise Exception("empty frontier")
+        else:
+            node = self.frontier.pop()
+            self._discard(node.state)
+            return node
+
+    def _discard(self, state):
+        count = self.states[state]
+        if count == 1:
+            del self.states[state]
+        else:
+            self.states[state] = count - 1
+
+
+class DequeQueueFrontier(DequeStackFrontier):
+
+    def remove(self):
+        if self.empty():
+            raise Exception("empty frontier")
+        else:
+            node = self.frontier.popleft()
+            self._discard(node.state)
+            return node
+
+
+class TrackedFrontier():
+    """
+    Mixin that counts adds and removes and the frontier's high-water
+    mark. List it before the frontier class it extends, as in
+    TrackedStackFrontier, so untracked frontiers pay nothing.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.added = 0
+        self.removed = 0
+        self.high_water = 0
+
+    def add(self, node):
+        super().add(node)
+        self.added += 1
+        if len(self.frontier) > self.high_water:
+            self.high_water = len(self.frontier)
+
+    def remove(self):
+        node = super().remove()
+        self.removed += 1
+        return node
+
+    def stats(self):
+        return {
+            "added": self.added,
+            "removed": self.removed,
+            "high_water": self.high_water,
+        }
+
+
+class TrackedStackFrontier(TrackedFrontier, StackFrontier):
+    pass
@@ -0,0 +1,273 @@
+"""
+Benchmark the PageRank engines on synthetic link graphs.
+
+Each graph is generated from a seed, ranked by every engine that
+handles its size, and compared with a reference solution from sparse
+power iteration run to a much tighter tolerance. For every run the
+time, the peak memory allocated during it (traced separately, since
+tracing slows pure Python down), the iterations and the L1 error are
+recorded.
+
+Building an engine's inputs (the sparse matrix, the binary graph
+directory, the ranks before an incremental change) is not timed.
+
+Usage: python benchmark.py [--graphs ...] [--sizes ...] [--engines ...]
+                           [--output FILE]
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+
+import incremental
+import outofcore
+import pagerank
+import solvers
+import sparse
+import walkers
+from pagerank import DAMPING, SAMPLES
+
+# Average number of links out of a page
+LINKS = 8
+
+# Fraction of pages without links in dangling-heavy graphs
+DANGLING = 0.5
+
+# Pages given new links before an incremental update
+CHANGES = 10
+
+# Tolerance the reference ranks are iterated to
+REFERENCE_TOLERANCE = 1e-13
+
+
+def scale_free(n, links, rng):
+    """
+    Returns a corpus grown by preferential attachment: each new page
+    links to earlier pages chosen in proportion to their in-links
+    plus one, so a few pages gather most of the links.
+    """
+    corpus = {}
+    # Every page once, plus once more for every link to it
+    weighted = []
+    for i in range(n):
+        page = f"{i}.html"
+        count = min(i, rng.randint(1, 2 * links - 1))
+        targets = set()
+        while len(targets) < count:
+            targets.add(rng.choice(weighted))
+        corpus[page] = targets
+        weighted.extend(targets)
+        weighted.append(page)
+    return corpus
+
+
+def random_graph(n, links, rng):
+    """
+    Returns a corpus whose n * links links join pages chosen uniformly
+    at random.
+    """
+    pages = [f"{i}.html" for i in range(n)]
+    corpus = {page: set() for page in pages}
+    for _ in range(n * links):
+        source, target = rng.choice(pages), rng.choice(pages)
+        if source != target:
+            corpus[source].add(target)
+    return corpus
+
+
+def dangling_heavy(n, links, rng, fraction=DANGLING):
+    """
+    Returns a random corpus in which `fraction` of the pages have no
+    links, and the rest have enough to keep the average at `links`.
+    """
+    pages = [f"{i}.html" for i in range(n)]
+    corpus = {page: set() for page in pages}
+    linking = [page for page in pages if rng.random() >= fraction]
+    for _ in range(n * links):
+        if not linking:
+            break
+        source, target = rng.choice(linking), rng.choice(pages)
+        if source != target:
+            corpus[source].add(target)
+    return corpus
+
+
+GENERATORS = {
+    "scale-free": scale_free,
+    "random": random_graph,
+    "dangling": dangling_heavy,
+}
+
+
+def dict_engine(corpus, args):
+    return lambda: pagerank.dict_iteration(corpus, DAMPING)
+
+
+def sample_engine(corpus, args):
+    return lambda: (pagerank.sample_pagerank(corpus, DAMPING, args.samples), None)
+
+
+def walkers_engine(corpus, args):
+    def run():
+        ranks, report = walkers.parallel_sample_pagerank(
+            corpus, DAMPING, args.samples, args.processes or None, args.seed
+        )
+        return ranks, None
+    return run
+
+
+def solver_engine(solver):
+    def engine(corpus, args):
+        links = sparse.link_matrix(corpus)
+        return lambda: solvers.solve(links, DAMPING, solver)
+    return engine
+
+
+def out_of_core_engine(corpus, args):
+    directory = os.path.join(args.scratch, "graph")
+    outofcore.write_graph(corpus, directory)
+    return lambda: outofcore.memmap_pagerank(directory, DAMPING)
+
+
+def incremental_engine(corpus, args):
+    """
+    Gives CHANGES pages other links, ranks that corpus, and times
+    updating those ranks back to `corpus`.
+    """
+    rng = random.Random(args.seed)
+    pages = list(corpus)
+    changed = rng.sample(pages, min(CHANGES, len(pages)))
+    before = {page: set(links) for page, links in corpus.items()}
+    for page in changed:
+        before[page] = set(rng.sample(pages, min(LINKS, len(pages)))) - {page}
+    ranks = sparse.sparse_pagerank(before, DAMPING)
+    changes = {page: corpus[page] for page in changed}
+
+    def run():
+        # The update changes the corpus it is given, so give it a copy
+        current = {page: set(links) for page, links in before.items()}
+        return incremental.update_pagerank(current, ranks, DAMPING, changes), None
+    return run
+
+
+# Each engine and the most pages it is run on by default
+ENGINES = {
+    "dict": (dict_engine, 10 ** 4),
+    "sample": (sample_engine, 10 ** 5),
+    "walkers": (walkers_engine, 10 ** 5),
+    "power": (solver_engine("power"), 10 ** 6),
+    "gauss-seidel": (solver_engine("gauss-seidel"), 10 ** 6),
+    "extrapolation": (solver_engine("extrapolation"), 10 ** 6),
+    "adaptive": (solver_engine("adaptive"), 10 ** 6),
+    "out-of-core": (out_of_core_engine, 10 ** 6),
+    "incremental": (incremental_engine, 10 ** 6),
+}
+
+
+def reference(corpus):
+    """
+    Returns the reference rank vector of a corpus, in corpus order.
+    """
+    links = sparse.link_matrix(corpus)
+    ranks, _ = sparse.power_iteration(links, DAMPING, REFERENCE_TOLERANCE,
+                                      max_iterations=10000)
+    return ranks
+
+
+def measure(engine, corpus, expected, args):
+    """
+    Runs an engine, returning a dictionary of its time, peak memory,
+    iterations and L1 error.
+    """
+    run = engine(corpus, args)
+    start = time.perf_counter()
+    ranks, iterations = run()
+    seconds = time.perf_counter() - start
+
+    tracemalloc.start()
+    run()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    if isinstance(ranks, dict):
+        ranks = np.array([ranks.get(page, 0) for page in corpus])
+    return {
+        "seconds": seconds,
+        "peak_bytes": peak,
+        "iterations": None if iterations is None else int(iterations),
+        "error": float(np.abs(ranks - expected).sum()),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark PageRank engines.")
+    parser.add_argument("--graphs", nargs="+", choices=list(GENERATORS),
+                        default=list(GENERATORS))
+    parser.add_argument("--sizes", nargs="+", type=int,
+                        default=[100, 1000, 10000], metavar="N",
+                        help="numbers of pages (default: 100 1000 10000)")
+    parser.add_argument("--engines", nargs="+", choices=list(ENGINES),
+                        default=list(ENGINES))
+    parser.add_argument("--all", action="store_true",
+                        help="run every engine on every size, ignoring "
+                             "their size limits")
+    parser.add_argument("--links", type=int, default=LINKS,
+                        help="average links per page")
+    parser.add_argument("--samples", type=int, default=SAMPLES)
+    parser.add_argument("--processes", type=int, default=0, metavar="N",
+                        help="processes for the walkers engine (default: "
+                             "one per CPU)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", metavar="FILE",
+                        help="write the results to FILE as JSON")
+    args = parser.parse_args()
+
+    results = []
+    print(f"{'graph':>10} {'pages':>8} {'engine':>13} {'seconds':>9} "
+          f"{'peak MB':>8} {'iterations':>10} {'L1 error':>9}")
+    with tempfile.TemporaryDirectory() as scratch:
+        args.scratch = scratch
+        for graph in args.graphs:
+            for n in args.sizes:
+                rng = random.Random(f"{args.seed}:{graph}:{n}")
+                corpus = GENERATORS[graph](n, args.links, rng)
+                expected = reference(corpus)
+                for name in args.engines:
+                    engine, limit = ENGINES[name]
+                    if n > limit and not args.all:
+                        continue
+                    result = measure(engine, corpus, expected, args)
+                    result = {"graph": graph, "pages": n, "engine": name,
+                              "links": sum(map(len, corpus.values())),
+                              **result}
+                    results.append(result)
+                    iterations = result["iterations"]
+                    print(f"{graph:>10} {n:>8} {name:>13} "
+                          f"{result['seconds']:>9.4f} "
+                          f"{result['peak_bytes'] / 2 ** 20:>8.1f} "
+                          f"{'-' if iterations is None else iterations:>10} "
+                          f"{result['error']:>9.2e}")
+
+    if args.output:
+        report = {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "machine": platform.machine(),
+            "seed": args.seed,
+            "links": args.links,
+            "samples": args.samples,
+            "results": results,
+        }
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
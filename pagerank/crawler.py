@@ -0,0 +1,147 @@
+"""
+Parallel, streaming crawler for large corpora.
+
+Pages are found in nested directories and named by their path
+relative to the corpus, with "/" separators, so a flat corpus gets
+the same page names as `crawl`. Each file is read in fixed-size chunks
+and its links extracted as the chunks arrive, across a pool of
+worker processes.
+
+The link graph can be saved as an edge list: the number of pages,
+one page name per line, then one "source target" pair of page
+numbers per link. A path ending in ".gz" is compressed.
+"""
+
+import gzip
+import multiprocessing
+import os
+import posixpath
+import re
+
+# Bytes read from a file at a time
+CHUNK_SIZE = 1 << 16
+
+# Longest unfinished tag carried over from one chunk to the next
+MAX_TAG = 1 << 16
+
+LINK = re.compile(r"<a\s+(?:[^>]*?)href=\"([^\"]*)\"")
+
+
+def find_pages(directory):
+    """
+    Yields the relative names of the HTML pages under `directory`.
+    """
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        relative = os.path.relpath(root, directory)
+        for filename in sorted(files):
+            if filename.endswith(".html"):
+                name = os.path.join(relative, filename)
+                yield posixpath.normpath(name.replace(os.sep, "/"))
+
+
+def extract_links(path, page):
+    """
+    Returns the set of pages linked to from the file at `path`,
+    resolved against the directory of `page` and without fragments.
+    """
+    base = posixpath.dirname(page)
+    links = set()
+    tail = ""
+    with open(path, encoding="utf-8", errors="replace") as f:
+        while True:
+            chunk = f.read(CHUNK_SIZE)
+            text = tail + chunk
+
+            # Hold back a tag the chunk boundary may have cut in two
+            cut = text.rfind("<")
+            if not chunk or cut == -1 or text.find(">", cut) != -1:
+                cut = len(text)
+            for match in LINK.finditer(text, 0, cut):
+                link = match.group(1).partition("#")[0]
+                if link:
+                    links.add(posixpath.normpath(posixpath.join(base, link)))
+            tail = text[cut:]
+            if len(tail) > MAX_TAG:
+                tail = ""
+            if not chunk:
+                break
+    links.discard(page)
+    return links
+
+
+def parallel_crawl(directory, workers=None):
+    """
+    Returns the same dictionary as `crawl`, for a corpus that may
+    have nested directories, extracting links in `workers` processes.
+    """
+    return in_corpus(extract_pages(directory, find_pages(directory), workers))
+
+
+def extract_pages(directory, pages, workers=None):
+    """
+    Returns a dictionary mapping each of `pages` to all of its links,
+    in or out of the corpus, using a pool of `workers` processes.
+    Pages keep the order of `pages`.
+    """
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context("fork" if "fork" in methods else "spawn")
+    tasks = ((directory, page) for page in pages)
+    found = {}
+    with context.Pool(workers) as pool:
+        for page, links in pool.imap(_extract, tasks, chunksize=64):
+            found[page] = links
+    return found
+
+
+def _extract(task):
+    directory, page = task
+    return page, extract_links(os.path.join(directory, page), page)
+
+
+def in_corpus(pages):
+    """
+    Drops links to pages outside the corpus, in place, and returns
+    the corpus.
+    """
+    for page, links in pages.items():
+        pages[page] = {link for link in links if link in pages}
+    return pages
+
+
+def write_edges(corpus, path):
+    """
+    Writes a corpus as an edge list.
+    """
+    index = {page: i for i, page in enumerate(corpus)}
+    with open_edge_list(path, "w") as f:
+        f.write(f"{len(corpus)}\n")
+        for page in corpus:
+            f.write(page + "\n")
+        for page, links in corpus.items():
+            source = index[page]
+            for link in sorted(index[link] for link in links):
+                f.write(f"{source} {link}\n")
+
+
+def read_edges(path):
+    """
+    Reads a corpus written by write_edges.
+    """
+    with open_edge_list(path, "r") as f:
+        count = int(f.readline())
+        pages = [f.readline().rstrip("\n") for _ in range(count)]
+        corpus = {page: set() for page in pages}
+        for line in f:
+            source, target = line.split()
+            corpus[pages[int(source)]].add(pages[int(target)])
+    return corpus
+
+
+def open_edge_list(path, mode):
+    """
+    Opens an edge list as text, through gzip if its name ends in ".gz".
+    """
+    if path.endswith(".gz"):
+        return gzip.open(path, mode + "t", encoding="utf-8")
+    return open(path, mode, encoding="utf-8")
@@ -0,0 +1,112 @@
+"""
+Incremental PageRank after a few pages or links change.
+
+Every rank is a share of the random surfer's teleports and dangling
+jumps, which land uniformly, so the ranks are proportional to the
+solution of the purely local system
+
+    s = 1 + d A s
+
+where A only follows links (pages without links have no column).
+The previous ranks, rescaled, solve it exactly for the old graph, so
+after a change the residual 1 + d A s - s is non-zero only around the
+changed pages. Forward push moves that residual along links until
+what is left is small enough, touching only the affected region, and
+normalizing s gives the new ranks.
+"""
+
+from collections import deque
+
+# Default L1 bound on the error added by the update
+TOLERANCE = 1e-8
+
+
+def update_pagerank(corpus, ranks, damping_factor, changes,
+                    tolerance=TOLERANCE):
+    """
+    Returns the PageRank dictionary of the corpus after `changes`, a
+    dictionary mapping each new or changed page to its new set of
+    links, or to None if the page was removed. `corpus` is updated in
+    place; `ranks` are its PageRank values before the change.
+
+    The result is within `tolerance` (L1) of the exact ranks, plus
+    whatever error `ranks` already had.
+    """
+    d = damping_factor
+    dangling = sum(ranks[page] for page, links in corpus.items() if not links)
+    scale = len(corpus) / (1 - d + d * dangling)
+
+    # Pages that link to a removed page lose that link too
+    removed = {
+        page for page, links in changes.items()
+        if links is None and page in corpus
+    }
+    changes = dict(changes)
+    if removed:
+        for page, links in corpus.items():
+            if page not in changes and not links.isdisjoint(removed):
+                changes[page] = links - removed
+
+    # Take back what changed pages gave their old links
+    residual = {}
+    for page in changes:
+        links = corpus.get(page)
+        if links:
+            share = d * ranks[page] * scale / len(links)
+            for link in links:
+                residual[link] = residual.get(link, 0) - share
+
+    # Apply the change; new pages start from s = 0, so residual 1
+    total = scale
+    for page in removed:
+        total -= ranks[page] * scale
+        del corpus[page]
+        residual.pop(page, None)
+    for page, links in changes.items():
+        if links is not None and page not in corpus:
+            corpus[page] = set()
+            residual[page] = residual.get(page, 0) + 1
+    for page, links in changes.items():
+        if links is None:
+            continue
+        links = {link for link in links if link in corpus and link != page}
+        corpus[page] = links
+        if links and page in ranks:
+            share = d * ranks[page] * scale / len(links)
+            for link in links:
+                residual[link] = residual.get(link, 0) + share
+
+    # The ranks' error is within tolerance once the residual left is
+    # within `budget`. Push whatever is above `limit` along links,
+    # lowering the limit until that holds; at budget / N it must
+    budget = tolerance * (1 - d) * total / 2
+    limit = budget
+    added = {}
+    while True:
+        queue = deque(page for page, r in residual.items() if abs(r) > limit)
+        while queue:
+            page = queue.popleft()
+            r = residual.pop(page, 0)
+            if abs(r) <= limit:
+                if r:
+                    residual[page] = r
+                continue
+            added[page] = added.get(page, 0) + r
+            total += r
+            links = corpus[page]
+            if not links:
+                continue
+            share = d * r / len(links)
+            for link in links:
+                before = residual.get(link, 0)
+                residual[link] = before + share
+                if abs(before + share) > limit >= abs(before):
+                    queue.append(link)
+        if sum(abs(r) for r in residual.values()) <= budget:
+            break
+        limit = max(limit / 8, budget / len(corpus))
+
+    return {
+        page: (ranks.get(page, 0) * scale + added.get(page, 0)) / total
+        for page in corpus
+    }
@@ -0,0 +1,130 @@
+"""
+On-disk link-graph index for incremental re-crawls.
+
+The index is written into the corpus directory and records, for each
+page, the file's modification time, size and content hash, and every
+link found in it. On the next crawl a page is re-parsed only when its
+hash changed; a page whose time or size changed but whose content did
+not just has its entry refreshed.
+
+In-corpus filtering is also incremental: only pages that were
+re-parsed, or that link to a page that appeared or disappeared, have
+their links filtered again.
+"""
+
+import hashlib
+import os
+import pickle
+import tempfile
+
+import crawler
+
+CACHE_NAME = ".pagerank.cache"
+CACHE_VERSION = 1
+
+# Fewer changed files than this are re-parsed without a process pool
+POOL_THRESHOLD = 256
+
+
+def cached_crawl(directory, workers=None, rebuild=False):
+    """
+    Returns the same dictionary as crawler.parallel_crawl, re-parsing
+    only the files that changed since the index was last written, or
+    every file when `rebuild` is true.
+    """
+    path = os.path.join(directory, CACHE_NAME)
+    index = None if rebuild else read_index(path)
+    if index is None:
+        index = {"files": {}, "links": {}, "corpus": {}}
+    files, links, corpus = index["files"], index["links"], index["corpus"]
+
+    found = {}
+    for page in crawler.find_pages(directory):
+        stat = os.stat(os.path.join(directory, page))
+        found[page] = (stat.st_mtime_ns, stat.st_size)
+
+    removed = files.keys() - found.keys()
+    added = found.keys() - files.keys()
+    stale = []
+    refreshed = False
+    for page, (mtime, size) in found.items():
+        known = files.get(page)
+        if known is not None and known[:2] == (mtime, size):
+            continue
+        digest = file_digest(os.path.join(directory, page))
+        if known is None or known[2] != digest:
+            stale.append(page)
+        files[page] = (mtime, size, digest)
+        refreshed = True
+
+    for page in removed:
+        del files[page], links[page], corpus[page]
+    if len(stale) >= POOL_THRESHOLD:
+        links.update(crawler.extract_pages(directory, stale, workers))
+    else:
+        for page in stale:
+            links[page] = crawler.extract_links(os.path.join(directory, page),
+                                                page)
+
+    # Refilter the pages whose links changed, and the pages linking
+    # to a page that came or went
+    refilter = set(stale)
+    moved = added | removed
+    if moved:
+        refilter.update(
+            page for page, targets in links.items()
+            if not targets.isdisjoint(moved)
+        )
+    for page in refilter:
+        corpus[page] = {link for link in links[page] if link in files}
+
+    if refreshed or removed:
+        write_index(path, index)
+    # In find_pages order, as the index's own order depends on set
+    # iteration and so on the hash seed
+    return {page: corpus[page] for page in found}
+
+
+def file_digest(path):
+    """
+    Returns the BLAKE2 hash of a file's contents.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(crawler.CHUNK_SIZE), b""):
+            digest.update(block)
+    return digest.digest()
+
+
+def read_index(path):
+    """
+    Returns the stored index, or None if it is missing, unreadable or
+    from another version.
+    """
+    try:
+        with open(path, "rb") as f:
+            if pickle.load(f) != {"version": CACHE_VERSION}:
+                return None
+            return pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError):
+        return None
+
+
+def write_index(path, index):
+    """
+    Atomically replaces the index at `path`.
+    A read-only corpus simply goes without one.
+    """
+    directory = os.path.dirname(path) or "."
+    try:
+        fd, temp = tempfile.mkstemp(dir=directory, prefix=CACHE_NAME)
+    except OSError:
+        return
+    try:
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump({"version": CACHE_VERSION}, f,
+                        protocol=pickle.HIGHEST_PROTOCOL)
+            pickle.dump(index, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp, path)
+    except OSError:
+        os.unlink(temp)
@@ -0,0 +1,163 @@
+"""
+Out-of-core PageRank over a memory-mapped binary link graph.
+
+A graph directory holds:
+
+    header.json    page and link counts, and the integer type used
+    pages.txt      one page name per line
+    edges.bin      the source page of every link, sorted by target
+    offsets.bin    where each target's links start in edges.bin (N + 1)
+    degrees.bin    the number of links out of each page
+
+It is written by a two-pass counting sort, so an edge list too big
+for memory can be converted while streaming it. Each power iteration
+then reads edges.bin block by block through numpy.memmap, and only
+the rank vectors are held in memory.
+"""
+
+import itertools
+import json
+import os
+
+import numpy as np
+
+import crawler
+from sparse import MAX_ITERATIONS, TOLERANCE, distance
+
+# Links read from an edge list, or from edges.bin, at a time
+BLOCK = 1 << 22
+
+
+def write_graph(corpus, directory):
+    """
+    Writes a corpus dictionary as a binary graph directory.
+    """
+    pages = list(corpus)
+    index = {page: i for i, page in enumerate(pages)}
+
+    def blocks():
+        sources, targets = [], []
+        for page in pages:
+            for link in corpus[page]:
+                sources.append(index[page])
+                targets.append(index[link])
+        yield np.array(sources, dtype=np.int64), np.array(targets, dtype=np.int64)
+
+    _write(directory, pages, blocks)
+
+
+def convert_edges(path, directory, block=BLOCK):
+    """
+    Converts an edge list written by crawler.write_edges into a binary
+    graph directory, reading it `block` links at a time.
+    """
+    with crawler.open_edge_list(path, "r") as f:
+        count = int(f.readline())
+        pages = [f.readline().rstrip("\n") for _ in range(count)]
+        start = f.tell()
+
+    def blocks():
+        with crawler.open_edge_list(path, "r") as f:
+            f.seek(start)
+            while True:
+                lines = list(itertools.islice(f, block))
+                if not lines:
+                    return
+                pairs = np.array(" ".join(lines).split(), dtype=np.int64)
+                yield pairs[0::2], pairs[1::2]
+
+    _write(directory, pages, blocks)
+
+
+def _write(directory, pages, blocks):
+    """
+    Writes the graph files, calling `blocks` twice for iterators over
+    (sources, targets) arrays of links: once to count each page's
+    links, once to place every link in its target's run.
+    """
+    os.makedirs(directory, exist_ok=True)
+    n = len(pages)
+    dtype = np.int32 if n < 2 ** 31 else np.int64
+    with open(os.path.join(directory, "pages.txt"), "w", encoding="utf-8") as f:
+        for page in pages:
+            f.write(page + "\n")
+
+    out_degree = np.zeros(n, dtype=np.int64)
+    in_degree = np.zeros(n, dtype=np.int64)
+    for sources, targets in blocks():
+        out_degree += np.bincount(sources, minlength=n)
+        in_degree += np.bincount(targets, minlength=n)
+    offsets = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(in_degree, out=offsets[1:])
+    links = int(offsets[-1])
+
+    # A memmap cannot be empty, so a graph without links gets one slot
+    edges = np.memmap(os.path.join(directory, "edges.bin"), dtype=dtype,
+                      mode="w+", shape=(max(links, 1),))
+    cursor = offsets[:-1].copy()
+    for sources, targets in blocks():
+        order = np.argsort(targets, kind="stable")
+        sources, targets = sources[order], targets[order]
+        firsts, counts = np.unique(targets, return_index=True,
+                                   return_counts=True)[1:]
+        within = np.arange(len(targets)) - np.repeat(firsts, counts)
+        edges[cursor[targets] + within] = sources
+        cursor[targets[firsts]] += counts
+    edges.flush()
+    del edges
+
+    offsets.tofile(os.path.join(directory, "offsets.bin"))
+    out_degree.astype(dtype).tofile(os.path.join(directory, "degrees.bin"))
+    header = {"pages": n, "links": links, "dtype": np.dtype(dtype).name}
+    with open(os.path.join(directory, "header.json"), "w") as f:
+        json.dump(header, f)
+
+
+def read_pages(directory):
+    with open(os.path.join(directory, "pages.txt"), encoding="utf-8") as f:
+        return [line.rstrip("\n") for line in f]
+
+
+def memmap_pagerank(directory, damping_factor, tolerance=TOLERANCE,
+                    max_iterations=MAX_ITERATIONS, norm="l1", block=BLOCK):
+    """
+    Returns (rank vector, iterations) for a binary graph directory,
+    by power iteration that streams `block` links at a time.
+    """
+    with open(os.path.join(directory, "header.json")) as f:
+        header = json.load(f)
+    n, links, dtype = header["pages"], header["links"], header["dtype"]
+    edges = np.memmap(os.path.join(directory, "edges.bin"), dtype=dtype,
+                      mode="r", shape=(max(links, 1),))
+    offsets = np.memmap(os.path.join(directory, "offsets.bin"),
+                        dtype=np.int64, mode="r", shape=(n + 1,))
+    degrees = np.memmap(os.path.join(directory, "degrees.bin"), dtype=dtype,
+                        mode="r", shape=(n,))
+    dangling = degrees == 0
+
+    # Blocks of whole target runs, each about `block` links long
+    bounds = np.unique(np.append(
+        np.searchsorted(offsets, np.arange(0, links, block), side="right") - 1,
+        n
+    ))
+
+    ranks = np.full(n, 1 / n)
+    share = np.empty(n)
+    for iteration in range(1, max_iterations + 1):
+        np.divide(ranks, degrees, out=share, where=~dangling)
+        spread = damping_factor * ranks[dangling].sum() + 1 - damping_factor
+        new_ranks = np.full(n, spread / n)
+        for first, last in zip(bounds[:-1], bounds[1:]):
+            start, stop = offsets[first], offsets[last]
+            if start == stop:
+                continue
+            runs = np.diff(offsets[first:last + 1])
+            local = np.repeat(np.arange(last - first), runs)
+            new_ranks[first:last] += damping_factor * np.bincount(
+                local, weights=share[edges[start:stop]], minlength=last - first
+            )
+        change = distance(new_ranks, ranks, norm)
+        ranks = new_ranks
+        if change < tolerance:
+            break
+    return ranks, iteration
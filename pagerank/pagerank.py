@@ -1,26 +1,145 @@
+import argparse
 import os
 import random
 import re
-import sys
+
+import crawler
+import linkcache
 
 DAMPING = 0.85
 SAMPLES = 10000
+MARGIN = 0.001
 
 
 def main():
-    if len(sys.argv) != 2:
-        sys.exit("Usage: python pagerank.py corpus")
-    corpus = crawl(sys.argv[1])
-    ranks = sample_pagerank(corpus, DAMPING, SAMPLES)
-    print(f"PageRank Results from Sampling (n = {SAMPLES})")
+    parser = argparse.ArgumentParser(description="PageRank of a corpus.")
+    parser.add_argument("corpus",
+                        help="directory of HTML pages, an edge list file, or "
+                             "a binary graph directory")
+    parser.add_argument("--workers", type=int, default=0, metavar="N",
+                        help="extract links in N processes (default: one "
+                             "per CPU)")
+    parser.add_argument("--rebuild-cache", action="store_true",
+                        help="re-parse every page instead of only the pages "
+                             "changed since the last run")
+    parser.add_argument("--save-edges", metavar="FILE",
+                        help="write the link graph to FILE as an edge list")
+    parser.add_argument("--out-of-core", metavar="DIR",
+                        help="write the link graph to DIR as a binary graph "
+                             "and rank it there with memory-mapped iteration, "
+                             "without sampling")
+    parser.add_argument("--engine", choices=["dict", "sparse"],
+                        help="iterate over nested dicts, or over a sparse "
+                             "matrix with NumPy and SciPy (default: dict, "
+                             "or sparse with --solver or --norm)")
+    parser.add_argument("--solver",
+                        choices=["power", "gauss-seidel", "extrapolation",
+                                 "adaptive"],
+                        help="sparse engine solver (default: power)")
+    parser.add_argument("--margin", type=float,
+                        help="stop iterating once the ranks change by less "
+                             f"than this (default: {MARGIN}, or 1e-8 for the "
+                             "sparse engine)")
+    parser.add_argument("--norm", choices=["l1", "l2", "max"],
+                        help="how the sparse and out-of-core engines "
+                             "measure that change (default: l1)")
+    parser.add_argument("--samples", type=int, default=SAMPLES)
+    parser.add_argument("--processes", type=int, default=0, metavar="N",
+                        help="sample with independent walkers in N processes")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="seed for the parallel walkers")
+    parser.add_argument("--tolerance", type=float,
+                        help="with --processes, stop sampling once every "
+                             "95%% confidence interval is within +/- this")
+    args = parser.parse_args()
+    out_of_core = args.out_of_core or os.path.isfile(
+        os.path.join(args.corpus, "header.json")
+    )
+    if out_of_core and (args.engine or args.solver):
+        parser.error("--engine and --solver do not apply out of core")
+    if args.engine == "dict" and (args.solver or args.norm):
+        parser.error("--solver and --norm need the sparse engine")
+    if args.engine is None:
+        args.engine = "sparse" if args.solver or args.norm else "dict"
+    if args.engine == "dict" and args.margin is not None and args.margin <= 0:
+        # Dict iteration has no iteration limit to stop it otherwise
+        parser.error("--margin must be positive for the dict engine")
+    args.solver = args.solver or "power"
+    args.norm = args.norm or "l1"
+
+    if out_of_core:
+        rank_out_of_core(args)
+        return
+
+    if os.path.isfile(args.corpus):
+        corpus = crawler.read_edges(args.corpus)
+    else:
+        corpus = linkcache.cached_crawl(args.corpus, args.workers or None,
+                                        rebuild=args.rebuild_cache)
+    if args.save_edges:
+        crawler.write_edges(corpus, args.save_edges)
+
+    if args.processes:
+        # walkers imports this module, so it cannot be imported above
+        import walkers
+        ranks, report = walkers.parallel_sample_pagerank(
+            corpus, DAMPING, args.samples, args.processes, args.seed,
+            tolerance=args.tolerance
+        )
+        print(f"PageRank Results from Sampling (n = {report['samples']}, "
+              f"standard error {report['standard_error']:.5f})")
+    else:
+        ranks = sample_pagerank(corpus, DAMPING, args.samples)
+        print(f"PageRank Results from Sampling (n = {args.samples})")
     for page in sorted(ranks):
         print(f"  {page}: {ranks[page]:.4f}")
-    ranks = iterate_pagerank(corpus, DAMPING)
-    print(f"PageRank Results from Iteration")
+    if args.engine == "sparse":
+        # Only the sparse engine needs NumPy and SciPy
+        import solvers
+        import sparse
+        links = sparse.link_matrix(corpus)
+        margin = sparse.TOLERANCE if args.margin is None else args.margin
+        vector, iterations = solvers.solve(links, DAMPING, args.solver, margin,
+                                           args.norm)
+        ranks = links.ranks(vector)
+        print(f"PageRank Results from Iteration "
+              f"({args.solver}, {iterations} iterations)")
+    else:
+        margin = MARGIN if args.margin is None else args.margin
+        ranks, iterations = dict_iteration(corpus, DAMPING, margin)
+        print(f"PageRank Results from Iteration "
+              f"(dict, {iterations} iterations)")
     for page in sorted(ranks):
         print(f"  {page}: {ranks[page]:.4f}")
 
 
+def rank_out_of_core(args):
+    """
+    Ranks a binary graph directory without loading the link graph,
+    first writing it from the corpus when --out-of-core is given.
+    An edge list file is converted without being read into memory.
+    """
+    # Only the out-of-core engine needs NumPy
+    import outofcore
+    import sparse
+    graph = args.corpus
+    if args.out_of_core:
+        graph = args.out_of_core
+        if os.path.isfile(args.corpus):
+            outofcore.convert_edges(args.corpus, graph)
+        else:
+            corpus = linkcache.cached_crawl(args.corpus, args.workers or None,
+                                            rebuild=args.rebuild_cache)
+            outofcore.write_graph(corpus, graph)
+
+    margin = sparse.TOLERANCE if args.margin is None else args.margin
+    vector, iterations = outofcore.memmap_pagerank(graph, DAMPING, margin,
+                                                   norm=args.norm)
+    print(f"PageRank Results from Iteration (out of core, {iterations} iterations)")
+    for page, rank in sorted(zip(outofcore.read_pages(graph), vector.tolist())):
+        print(f"  {page}: {rank:.4f}")
+
+
 def crawl(directory):
     """
     Parse a directory of HTML pages and check for links to other pages.
@@ -79,49 +198,79 @@ def sample_pagerank(corpus, damping_factor, n):
     their estimated PageRank value (a value between 0 and 1). All
     PageRank values should sum to 1.
     """
-    PageRank = {}
-
-    # keeps track of the nujmber of visits in each page
-    PageVisits = {page: 0 for page in corpus}
-
-    # first page
-    page = random.choice(list(corpus.keys()))
-
-    for _ in range(n):
-
-        # update page visits
-        PageVisits[page] += 1
+    pages, links = surfer_tables(corpus)
+    visits = random_walk(links, damping_factor, n, random)
+    return {page: count / n for page, count in zip(pages, visits)}
 
-        # update the given page via the transition_model function
-        model = transition_model(corpus, page, damping_factor)
 
-        page = random.choices(list(model.keys()), weights=model.values())[0]
-
-    # calculating the pagerank
-    for p in PageVisits:
-        PageRank[p] = PageVisits[p] / n
-
-    return PageRank
+def surfer_tables(corpus):
+    """
+    Returns (pages, links): the corpus's pages in order, and for each
+    page index a sorted tuple of the indexes of the pages it links to.
+    Sorting keeps seeded walks reproducible, since set order is not.
+    """
+    pages = list(corpus)
+    index = {page: i for i, page in enumerate(pages)}
+    links = [tuple(sorted(index[link] for link in corpus[page])) for page in pages]
+    return pages, links
 
 
-def iterate_pagerank(corpus, damping_factor):
+def random_walk(links, damping_factor, n, rng):
+    """
+    Walks `n` steps of the random surfer over the `links` tables of
+    surfer_tables, starting at a random page, and returns the number
+    of visits to each page index. `rng` is a random.Random (or the
+    random module).
+
+    The transition model is a mixture of two uniform distributions:
+    with probability `damping_factor` one of the page's links, and
+    otherwise (or always, for a page without links) any page. So each
+    step is one or two random() calls and a tuple lookup, with no
+    distribution built per step.
+    """
+    total = len(links)
+    visits = [0] * total
+    uniform = rng.random
+    page = int(uniform() * total)
+    for _ in range(n):
+        visits[page] += 1
+        outgoing = links[page]
+        chance = uniform()
+        if outgoing and chance < damping_factor:
+            # chance / damping_factor is itself uniform on [0, 1)
+            page = outgoing[int(chance / damping_factor * len(outgoing))]
+        else:
+            page = int(uniform() * total)
+    return visits
+
+
+def iterate_pagerank(corpus, damping_factor, margin=MARGIN):
     """
     Return PageRank values for each page by iteratively updating
     PageRank values until convergence.
 
     Return a dictionary where keys are page names, and values are
     their estimated PageRank value (a value between 0 and 1). All
-    PageRank values should sum to 1.
+    PageRank values should sum to 1. Iteration stops once no value
+    changes by `margin` or more.
+    """
+    ranks, _ = dict_iteration(corpus, damping_factor, margin)
+    return ranks
+
+
+def dict_iteration(corpus, damping_factor, margin=MARGIN):
+    """
+    Returns (ranks, iterations) for iterate_pagerank, counting the
+    passes made over the corpus before no value changed by `margin`.
     """
 
     # distribute probability
     PageRank = {page: 1 / len(corpus) for page in corpus}
-
-    # convergence margin
-    margin = 0.001
+    iterations = 0
 
     # loop until values converge
     while True:
+        iterations += 1
 
         new_rank = {}
 
@@ -147,7 +296,7 @@ def iterate_pagerank(corpus, damping_factor):
 
         PageRank = new_rank
 
-    return PageRank
+    return PageRank, iterations
 
 
 if __name__ == "__main__":
@@ -0,0 +1,135 @@
+"""
+Faster-converging alternatives to sparse power iteration.
+
+Every solver takes a LinkMatrix and returns (rank vector, iterations),
+iterating until the change between successive rank vectors, measured
+in `norm` ("l1", "l2" or "max"), falls below `tolerance`:
+
+    power           plain power iteration (sparse.power_iteration)
+    gauss-seidel    each page is updated from the newest values of the
+                    pages before it, as one sparse triangular solve
+    extrapolation   power iteration, with the limit estimated from the
+                    last four iterates every few steps
+    adaptive        power iteration that stops recomputing pages whose
+                    values have converged
+"""
+
+import numpy as np
+import scipy.sparse as sp
+from scipy.sparse.linalg import spsolve_triangular
+
+from sparse import MAX_ITERATIONS, TOLERANCE, distance, power_iteration
+
+# Power iterations between quadratic extrapolations
+EXTRAPOLATE_EVERY = 10
+
+# The adaptive solver drops converged rows from its matrix once fewer
+# than this fraction of the rows it multiplies are still changing
+SHRINK = 0.75
+
+
+def gauss_seidel(links, damping_factor, tolerance=TOLERANCE,
+                 max_iterations=MAX_ITERATIONS, norm="l1"):
+    """
+    Solves (I - d M) r = spread by Gauss-Seidel sweeps. The spread of
+    the dangling pages' rank is taken from the previous sweep.
+    """
+    n = len(links)
+    system = sp.identity(n, format="csr") - damping_factor * links.matrix
+    lower = sp.tril(system, format="csr")
+    upper = damping_factor * sp.triu(links.matrix, k=1, format="csr")
+
+    ranks = np.full(n, 1 / n)
+    for iteration in range(1, max_iterations + 1):
+        spread = damping_factor * ranks[links.dangling].sum() + 1 - damping_factor
+        new_ranks = spsolve_triangular(lower, upper @ ranks + spread / n,
+                                       lower=True)
+        new_ranks /= new_ranks.sum()
+        change = distance(new_ranks, ranks, norm)
+        ranks = new_ranks
+        if change < tolerance:
+            break
+    return ranks, iteration
+
+
+def extrapolated(links, damping_factor, tolerance=TOLERANCE,
+                 max_iterations=MAX_ITERATIONS, norm="l1",
+                 every=EXTRAPOLATE_EVERY):
+    """
+    Power iteration with quadratic extrapolation (Kamvar et al.):
+    every `every` steps the last four iterates are fitted to cancel
+    the second and third eigenvectors' contributions.
+    """
+    ranks = np.full(len(links), 1 / len(links))
+    history = []
+    for iteration in range(1, max_iterations + 1):
+        new_ranks = links.step(ranks, damping_factor)
+        change = distance(new_ranks, ranks, norm)
+        ranks = new_ranks
+        if change < tolerance:
+            break
+        history = history[-3:] + [ranks]
+        if iteration % every == 0 and len(history) == 4:
+            ranks = _quadratic_extrapolation(*history)
+            history = []
+    return ranks, iteration
+
+
+def _quadratic_extrapolation(x0, x1, x2, x3):
+    """
+    Returns the extrapolated limit of four successive iterates.
+    """
+    y = np.column_stack((x1 - x0, x2 - x0))
+    gamma, *_ = np.linalg.lstsq(y, x0 - x3, rcond=None)
+    beta0 = gamma[0] + gamma[1] + 1
+    beta1 = gamma[1] + 1
+    limit = beta0 * x1 + beta1 * x2 + x3
+    np.maximum(limit, 0, out=limit)
+    return limit / limit.sum()
+
+
+def adaptive(links, damping_factor, tolerance=TOLERANCE,
+             max_iterations=MAX_ITERATIONS, norm="l1"):
+    """
+    Power iteration that freezes each page once its relative change
+    falls below `tolerance` (Kamvar et al.). When all of them do, the
+    change is below `tolerance` in every norm, since the ranks sum
+    to 1.
+    """
+    n = len(links)
+    ranks = np.full(n, 1 / n)
+    active = np.arange(n)
+    rows = links.matrix
+    for iteration in range(1, max_iterations + 1):
+        spread = damping_factor * ranks[links.dangling].sum() + 1 - damping_factor
+        new_ranks = damping_factor * (rows @ ranks) + spread / n
+        delta = np.abs(new_ranks - ranks[active])
+        change = distance(new_ranks, ranks[active], norm)
+        ranks[active] = new_ranks
+        if change < tolerance:
+            break
+
+        changing = active[delta >= tolerance * new_ranks]
+        if len(changing) == 0:
+            break
+        if len(changing) < SHRINK * len(active):
+            active = changing
+            rows = links.matrix[active]
+    return ranks / ranks.sum(), iteration
+
+
+SOLVERS = {
+    "power": power_iteration,
+    "gauss-seidel": gauss_seidel,
+    "extrapolation": extrapolated,
+    "adaptive": adaptive,
+}
+
+
+def solve(links, damping_factor, solver="power", tolerance=TOLERANCE,
+          norm="l1", max_iterations=MAX_ITERATIONS):
+    """
+    Returns (rank vector, iterations) from the named solver.
+    """
+    return SOLVERS[solver](links, damping_factor, tolerance, max_iterations,
+                           norm)
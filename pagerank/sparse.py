@@ -0,0 +1,223 @@
+"""
+Vectorized PageRank over a sparse transition matrix.
+
+The corpus returned by `crawl` is turned into a CSR matrix M whose
+row j holds 1 / outdegree(i) for each page i linking to page j. One
+power iteration step is then
+
+    r' = d * M r + (d * sum(r[dangling]) + 1 - d) / N
+
+where pages without links spread their rank over every page. That
+spread is the same for every page, so it is added as a single scalar
+(a rank-1 correction) rather than as N dense columns of M.
+
+Personalized PageRank replaces the uniform 1 / N with a teleport
+distribution v, which also receives the dangling pages' rank:
+
+    r' = d * M r + (d * sum(r[dangling]) + 1 - d) * v
+
+Many teleport vectors are solved together as the columns of one
+matrix, so each pass over M serves a whole block of them.
+"""
+
+import numpy as np
+import scipy.sparse as sp
+
+# Default L1 change between iterations at which the ranks are converged
+TOLERANCE = 1e-8
+MAX_ITERATIONS = 1000
+
+# Teleport vectors iterated together in personalized_power_iteration
+BLOCK = 64
+
+# Norms in which the change between iterations can be measured
+NORMS = {
+    "l1": lambda v: np.abs(v).sum(),
+    "l2": np.linalg.norm,
+    "max": lambda v: np.abs(v).max(),
+}
+
+
+class LinkMatrix():
+    def __init__(self, pages, sources, targets):
+        """
+        Builds the matrix for `pages` from parallel arrays of link
+        sources and targets (page indexes), one entry per link.
+        """
+        n = len(pages)
+        self.pages = pages
+        self.index = {page: i for i, page in enumerate(pages)}
+
+        sources = np.asarray(sources, dtype=np.int64)
+        targets = np.asarray(targets, dtype=np.int64)
+        self.out_degree = np.bincount(sources, minlength=n)
+        self.dangling = self.out_degree == 0
+        weights = 1.0 / self.out_degree[sources]
+        self.matrix = sp.csr_matrix((weights, (targets, sources)), shape=(n, n))
+
+    def __len__(self):
+        return len(self.pages)
+
+    def step(self, ranks, damping_factor):
+        """
+        Returns the ranks after one power iteration step.
+        """
+        spread = damping_factor * ranks[self.dangling].sum() + 1 - damping_factor
+        return damping_factor * (self.matrix @ ranks) + spread / len(self)
+
+    def ranks(self, vector):
+        """
+        Returns a rank vector as a dictionary keyed by page name.
+        """
+        return dict(zip(self.pages, vector.tolist()))
+
+
+def link_matrix(corpus):
+    """
+    Returns the LinkMatrix of a corpus mapping each page to the set of
+    pages it links to. Pages keep the corpus's order.
+    """
+    pages = list(corpus)
+    index = {page: i for i, page in enumerate(pages)}
+    count = sum(len(links) for links in corpus.values())
+    sources = np.fromiter(
+        (i for i, page in enumerate(pages) for _ in corpus[page]),
+        dtype=np.int64, count=count
+    )
+    targets = np.fromiter(
+        (index[link] for page in pages for link in corpus[page]),
+        dtype=np.int64, count=count
+    )
+    return LinkMatrix(pages, sources, targets)
+
+
+def distance(a, b, norm="l1"):
+    """
+    Returns the size of a - b in one of the NORMS.
+    """
+    return NORMS[norm](a - b)
+
+
+def power_iteration(links, damping_factor, tolerance=TOLERANCE,
+                    max_iterations=MAX_ITERATIONS, norm="l1"):
+    """
+    Returns (rank vector, iterations) for a LinkMatrix, iterating from
+    the uniform vector until the change, in `norm`, falls below
+    `tolerance`.
+    """
+    ranks = np.full(len(links), 1 / len(links))
+    for iteration in range(1, max_iterations + 1):
+        new_ranks = links.step(ranks, damping_factor)
+        change = distance(new_ranks, ranks, norm)
+        ranks = new_ranks
+        if change < tolerance:
+            break
+    return ranks, iteration
+
+
+def sparse_pagerank(corpus, damping_factor, tolerance=TOLERANCE):
+    """
+    Return PageRank values for each page, like iterate_pagerank, by
+    sparse power iteration.
+    """
+    links = link_matrix(corpus)
+    ranks, _ = power_iteration(links, damping_factor, tolerance)
+    return links.ranks(ranks)
+
+
+def teleport_matrix(links, seed_sets):
+    """
+    Returns a sparse N x k matrix whose column j spreads teleports
+    evenly over the pages in seed_sets[j].
+    """
+    rows, columns, weights = [], [], []
+    for j, seeds in enumerate(seed_sets):
+        for page in seeds:
+            rows.append(links.index[page])
+            columns.append(j)
+            weights.append(1 / len(seeds))
+    return sp.csc_matrix((weights, (rows, columns)),
+                         shape=(len(links), len(seed_sets)))
+
+
+def personalized_power_iteration(links, damping_factor, teleport, start=None,
+                                 tolerance=TOLERANCE,
+                                 max_iterations=MAX_ITERATIONS, block=BLOCK):
+    """
+    Returns (ranks, iterations) for every column of `teleport`, an
+    N x k array or sparse matrix of teleport distributions. ranks is
+    N x k and iterations holds the passes each column took.
+
+    Columns are iterated `block` at a time, and a column is set aside
+    once its L1 change falls below `tolerance`. `start` warm starts
+    the iteration from an earlier solution: an N x k array, or one
+    vector (such as the global PageRank) for every column.
+    """
+    n, k = teleport.shape
+    ranks = np.empty((n, k), order="F")
+    iterations = np.zeros(k, dtype=np.int64)
+
+    # SciPy multiplies a CSC matrix by many vectors at once several
+    # times faster than the CSR one
+    matrix = links.matrix.tocsc()
+    if sp.issparse(teleport):
+        teleport = teleport.tocsc()
+    for first in range(0, k, block):
+        columns = np.arange(first, min(first + block, k))
+        vectors = teleport[:, columns]
+        if start is None:
+            current = np.full(vectors.shape, 1 / n)
+        elif np.ndim(start) == 1:
+            current = np.repeat(np.asarray(start)[:, None], len(columns), axis=1)
+        else:
+            current = np.array(start[:, columns])
+
+        scratch = np.empty_like(current)
+        for iteration in range(1, max_iterations + 1):
+            spread = (damping_factor * current[links.dangling].sum(axis=0)
+                      + 1 - damping_factor)
+            new_ranks = matrix @ current
+            new_ranks *= damping_factor
+            _add_teleport(new_ranks, vectors, spread, scratch)
+            np.subtract(new_ranks, current, out=scratch)
+            change = np.abs(scratch, out=scratch).sum(axis=0)
+            current = new_ranks
+            iterations[columns] = iteration
+
+            converged = change < tolerance
+            if converged.any():
+                ranks[:, columns[converged]] = current[:, converged]
+                columns = columns[~converged]
+                current = current[:, ~converged]
+                if len(columns) == 0:
+                    break
+                vectors = vectors[:, ~converged]
+                scratch = np.empty_like(current)
+        ranks[:, columns] = current
+    return ranks, iterations
+
+
+def _add_teleport(ranks, vectors, spread, scratch):
+    """
+    Adds each column of `vectors` times its `spread` to `ranks`.
+    Sparse teleport vectors only touch their seed pages.
+    """
+    if sp.issparse(vectors):
+        columns = np.repeat(np.arange(vectors.shape[1]), np.diff(vectors.indptr))
+        ranks[vectors.indices, columns] += vectors.data * spread[columns]
+    else:
+        np.multiply(vectors, spread, out=scratch)
+        ranks += scratch
+
+
+def personalized_pagerank(corpus, damping_factor, seed_sets,
+                          tolerance=TOLERANCE):
+    """
+    Returns a list of PageRank dictionaries, one per set of seed
+    pages, each teleporting only to its own seeds.
+    """
+    links = link_matrix(corpus)
+    teleport = teleport_matrix(links, seed_sets)
+    ranks, _ = personalized_power_iteration(links, damping_factor, teleport,
+                                            tolerance=tolerance)
+    return [links.ranks(ranks[:, j]) for j in range(ranks.shape[1])]
@@ -0,0 +1,114 @@
+"""
+Monte Carlo PageRank from many independent random surfers.
+
+The `n` samples are split among walkers of at most `steps` steps each,
+run across a process pool. Walker k draws from its own random.Random
+seeded from (seed, k), so a given seed and pool size give the same
+estimate however the walkers are scheduled.
+
+Each walker's visit frequencies are an independent estimate of the
+ranks, so their spread gives the standard error of the merged mean.
+With a `tolerance`, sampling stops as soon as every page's confidence
+interval is narrower than that.
+"""
+
+import math
+import multiprocessing
+import random
+from statistics import NormalDist
+
+from pagerank import random_walk, surfer_tables
+
+# Steps taken by each walker
+STEPS = 100000
+
+# Link tables of the corpus being sampled, in each pool worker
+_links = None
+
+
+def parallel_sample_pagerank(corpus, damping_factor, n, processes=None,
+                             seed=0, steps=STEPS, tolerance=None,
+                             confidence=0.95):
+    """
+    Returns (ranks, report) for `n` samples taken by walkers of at most
+    `steps` steps in a pool of `processes` workers.
+
+    ranks maps each page to its estimated PageRank. The report gives
+    the samples and walkers used, the largest per-page standard error
+    and whether sampling stopped early: with `tolerance`, it stops
+    once the `confidence` interval of every page is within
+    +/- tolerance.
+    """
+    pages, links = surfer_tables(corpus)
+    processes = processes or multiprocessing.cpu_count()
+    steps = max(1, min(steps, n // (2 * processes) or 1))
+    walkers = min(max(2, math.ceil(n / steps)), max(1, n))
+    # Walker k takes lengths[k] steps: n shared out as evenly as
+    # possible, so that they add up to exactly n
+    base, extra = divmod(n, walkers)
+    lengths = [base + (walker < extra) for walker in range(walkers)]
+    z = NormalDist().inv_cdf((1 + confidence) / 2)
+
+    # Running sums of each page's visit frequency, and its square,
+    # over the walkers merged so far
+    total = [0.0] * len(pages)
+    squares = [0.0] * len(pages)
+    # Visits to each page, and steps taken, over those walkers
+    visited = [0] * len(pages)
+    samples = 0
+    merged = 0
+    error = math.inf
+
+    # Workers inherit the tables when forked, or receive them once
+    methods = multiprocessing.get_all_start_methods()
+    context = multiprocessing.get_context("fork" if "fork" in methods else "spawn")
+    with context.Pool(processes, _init_worker, (links,)) as pool:
+        tasks = ((seed, walker, damping_factor, lengths[walker])
+                 for walker in range(walkers))
+        for visits in pool.imap(_walk, tasks):
+            length = lengths[merged]
+            for page, count in enumerate(visits):
+                frequency = count / length
+                total[page] += frequency
+                squares[page] += frequency * frequency
+                visited[page] += count
+            samples += length
+            merged += 1
+
+            # Only check between whole rounds, so that where sampling
+            # stops does not depend on scheduling
+            if merged >= 2 and (merged % processes == 0 or merged == walkers):
+                error = _standard_error(total, squares, merged)
+                if tolerance is not None and z * error <= tolerance:
+                    break
+
+    ranks = {page: visited[i] / samples for i, page in enumerate(pages)}
+    report = {
+        "samples": samples,
+        "walkers": merged,
+        "standard_error": error,
+        "stopped_early": merged < walkers,
+    }
+    return ranks, report
+
+
+def _standard_error(total, squares, count):
+    """
+    Returns the largest standard error of the mean over all pages.
+    """
+    largest = 0.0
+    for s, s2 in zip(total, squares):
+        variance = max(0.0, (s2 - s * s / count) / (count - 1))
+        largest = max(largest, variance)
+    return math.sqrt(largest / count)
+
+
+def _init_worker(links):
+    global _links
+    _links = links
+
+
+def _walk(task):
+    seed, walker, damping_factor, steps = task
+    rng = random.Random(f"{seed}:{walker}")
+    return random_walk(_links, damping_factor, steps, rng)